@@ -1,9 +1,70 @@
+import os as _os
+import tempfile as _tempfile
 from django.conf import settings as _settings
 
 
 FILEROBOT_USER_MUST_MATCH = getattr(_settings, "FILEROBOT_USER_MUST_MATCH", False)
 FILEROBOT_DISABLE_HISTORY = getattr(_settings, "FILEROBOT_DISABLE_HISTORY", False)
+FILEROBOT_DEDUPLICATE_UPLOADS = getattr(_settings, "FILEROBOT_DEDUPLICATE_UPLOADS", False)
+
+# Store design states as JSON patches against the previous state,
+# with a full snapshot every FILEROBOT_DESIGN_STATE_SNAPSHOT_INTERVAL states.
+FILEROBOT_DESIGN_STATE_DELTAS = getattr(_settings, "FILEROBOT_DESIGN_STATE_DELTAS", False)
+FILEROBOT_DESIGN_STATE_SNAPSHOT_INTERVAL = getattr(_settings, "FILEROBOT_DESIGN_STATE_SNAPSHOT_INTERVAL", 20)
+
+# Codec new design states are compressed with; "zlib", "zstd" (needs `zstandard`) or None for plain JSON.
+FILEROBOT_DESIGN_STATE_COMPRESSION = getattr(_settings, "FILEROBOT_DESIGN_STATE_COMPRESSION", "zlib")
 
 FILEROBOT_COLLECTION_NAME = getattr(_settings, "FILEROBOT_COLLECTION_NAME", "filerobot")
 FILEROBOT_COLLECTION_CACHE_KEY = getattr(_settings, "FILEROBOT_COLLECTION_CACHE_KEY", f"FILEROBOT:{FILEROBOT_COLLECTION_NAME}")
 FILEROBOT_COLLECTION_CACHE_TIMEOUT = getattr(_settings, "FILEROBOT_COLLECTION_CACHE_TIMEOUT", 60 * 60 * 24 * 7)
+FILEROBOT_ORIGINALS_COLLECTION_NAME = getattr(_settings, "FILEROBOT_ORIGINALS_COLLECTION_NAME", "originals")
+FILEROBOT_ORIGINALS_CACHE_KEY = getattr(_settings, "FILEROBOT_ORIGINALS_CACHE_KEY", f"FILEROBOT:{FILEROBOT_ORIGINALS_COLLECTION_NAME}")
+
+# Give every user their own `FILEROBOT_COLLECTION_NAME` > `username` > `originals` collections.
+# Created on first use, or in bulk with `manage.py filerobot_user_collections`.
+FILEROBOT_USER_COLLECTIONS = getattr(_settings, "FILEROBOT_USER_COLLECTIONS", False)
+FILEROBOT_USER_COLLECTIONS_CACHE_KEY = getattr(_settings, "FILEROBOT_USER_COLLECTIONS_CACHE_KEY", f"FILEROBOT:{FILEROBOT_COLLECTION_NAME}:users")
+
+# Collections each user may choose images from; reset on collection and permission changes.
+FILEROBOT_CHOOSER_COLLECTIONS_CACHE_KEY = getattr(_settings, "FILEROBOT_CHOOSER_COLLECTIONS_CACHE_KEY", f"FILEROBOT:{FILEROBOT_COLLECTION_NAME}:chooser")
+
+# Resolved collections are also kept in-process; processes notice invalidations
+# made elsewhere after at most this many seconds.
+FILEROBOT_LOCAL_CACHE_TIMEOUT = getattr(_settings, "FILEROBOT_LOCAL_CACHE_TIMEOUT", 5)
+
+# Resumable chunked uploads for edited images.
+# Chunks are appended to a file on disk; the image is only validated and saved on finalize.
+FILEROBOT_CHUNKED_UPLOADS = getattr(_settings, "FILEROBOT_CHUNKED_UPLOADS", False)
+FILEROBOT_UPLOAD_CHUNK_SIZE = getattr(_settings, "FILEROBOT_UPLOAD_CHUNK_SIZE", 1024 * 1024)
+FILEROBOT_UPLOAD_DIR = getattr(_settings, "FILEROBOT_UPLOAD_DIR", _os.path.join(_tempfile.gettempdir(), "filerobot-uploads"))
+FILEROBOT_UPLOAD_EXPIRY = getattr(_settings, "FILEROBOT_UPLOAD_EXPIRY", 60 * 60 * 24)
+
+# Serve `file_view` as a native async view; defaults to on when running under ASGI.
+# Image decoding and storage writes then run in a pool of FILEROBOT_ASYNC_WORKERS threads.
+FILEROBOT_ASYNC_VIEWS = getattr(_settings, "FILEROBOT_ASYNC_VIEWS", bool(getattr(_settings, "ASGI_APPLICATION", None)))
+FILEROBOT_ASYNC_WORKERS = getattr(_settings, "FILEROBOT_ASYNC_WORKERS", 4)
+
+# Missing chooser thumbnails are generated in a pool of this many threads.
+FILEROBOT_RENDITION_WORKERS = getattr(_settings, "FILEROBOT_RENDITION_WORKERS", 4)
+
+# Paginate the chooser on (created_at, id) instead of with an OFFSET,
+# optionally showing the database's estimated number of images instead of a COUNT(*).
+FILEROBOT_CHOOSER_KEYSET_PAGINATION = getattr(_settings, "FILEROBOT_CHOOSER_KEYSET_PAGINATION", False)
+FILEROBOT_CHOOSER_ESTIMATED_COUNT = getattr(_settings, "FILEROBOT_CHOOSER_ESTIMATED_COUNT", False)
+
+# Cache rendered chooser result pages. Saving or deleting an image only drops the pages
+# showing its collection; other changes (f.e. usage counts) show up after the timeout.
+FILEROBOT_CHOOSER_CACHE = getattr(_settings, "FILEROBOT_CHOOSER_CACHE", False)
+FILEROBOT_CHOOSER_CACHE_KEY = getattr(_settings, "FILEROBOT_CHOOSER_CACHE_KEY", f"FILEROBOT:{FILEROBOT_COLLECTION_NAME}:results")
+FILEROBOT_CHOOSER_CACHE_TIMEOUT = getattr(_settings, "FILEROBOT_CHOOSER_CACHE_TIMEOUT", 60 * 5)
+
+# Renditions fetched along with the images of FilerobotBlocks in a StreamField,
+# so rendering the blocks does not query per image. Matches the block template's default spec.
+FILEROBOT_PREFETCH_RENDITIONS = getattr(_settings, "FILEROBOT_PREFETCH_RENDITIONS", ("original",))
+
+# Cache the HTML of rendered FilerobotBlocks and image values, keyed by image, file hash, filter spec and template.
+# "local" keeps fragments in-process only, "shared" in Django's cache as well. An image's fragments are reset when it is saved or deleted.
+FILEROBOT_FRAGMENT_CACHE = getattr(_settings, "FILEROBOT_FRAGMENT_CACHE", None)
+FILEROBOT_FRAGMENT_CACHE_KEY = getattr(_settings, "FILEROBOT_FRAGMENT_CACHE_KEY", f"FILEROBOT:{FILEROBOT_COLLECTION_NAME}:fragments")
+FILEROBOT_FRAGMENT_CACHE_TIMEOUT = getattr(_settings, "FILEROBOT_FRAGMENT_CACHE_TIMEOUT", 60 * 60)
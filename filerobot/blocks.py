@@ -1,9 +1,13 @@
+import functools
 from django.utils.translation import gettext_lazy as _
 from wagtail import blocks
 from wagtail.images import get_image_model
-from .value import FilerobotImageValue
+from .value import FilerobotImageValue, ImageIdentityMap
 from .forms import FilerobotField
-from .widgets import FilerobotWidget
+from .utils.fragments import get_fragment_key, render_fragment
+from filerobot import (
+    FILEROBOT_PREFETCH_RENDITIONS,
+)
     
 
 class FilerobotBlock(blocks.ChooserBlock):
@@ -16,6 +20,8 @@ class FilerobotBlock(blocks.ChooserBlock):
         icon = "image"
         template = "filerobot/blocks/filerobot.html"
         label = _("Image Editor")
+        # Filter specs whose renditions are fetched in `bulk_to_python`.
+        prefetch_renditions = FILEROBOT_PREFETCH_RENDITIONS
 
 
     def __init__(self, widget_kwargs = None, **kwargs):
@@ -35,12 +41,27 @@ class FilerobotBlock(blocks.ChooserBlock):
     def to_python(self, value):
         """
             Convert the value to a FilerobotImageValue.
+            The image is loaded when the value is first used.
         """
-        value = super().to_python(value)
-        if value is None:
-            return None
-        
-        return FilerobotImageValue.from_image(self, value)
+        return FilerobotImageValue.from_pk(
+            self, value, renditions=self.meta.prefetch_renditions or (),
+        )
+
+
+    def bulk_to_python(self, values):
+        """
+            Convert a list of pks to FilerobotImageValues, f.e. all the images of a StreamField.
+            Nothing is loaded until one of them is used; the images are then fetched with one query,
+            and their renditions for the `prefetch_renditions` specs with one more.
+        """
+        # Outside of a request, the values of one stream still share a map.
+        identity_map = ImageIdentityMap.current() or ImageIdentityMap()
+        renditions = self.meta.prefetch_renditions or ()
+
+        return [
+            FilerobotImageValue.from_pk(self, pk, identity_map=identity_map, renditions=renditions)
+            for pk in values
+        ]
 
     
     def get_prep_value(self, value):
@@ -48,11 +69,20 @@ class FilerobotBlock(blocks.ChooserBlock):
             Convert the value back to something usable by the database.
         """
         if isinstance(value, FilerobotImageValue):
-            value = value.image
+            # Loaded along with the other images of the stream; a deleted image is not stored.
+            return value.pk if value.image is not None else None
 
         return super().get_prep_value(value)
 
 
+    def render(self, value, context=None):
+        """
+            Render the block, from the fragment cache if FILEROBOT_FRAGMENT_CACHE is enabled.
+        """
+        key = get_fragment_key(value, self.meta.template, context)
+        return render_fragment(key, functools.partial(super().render, value, context))
+
+
     def value_from_form(self, value):
         """
             Convert the value from the form to a FilerobotImageValue.
@@ -76,18 +106,27 @@ class FilerobotBlock(blocks.ChooserBlock):
 
         return super().value_for_form(value)
 
+    def set_meta_options(self, opts):
+        super().set_meta_options(opts)
+        # The formfield is built from the meta options.
+        self.__dict__.pop("_field", None)
+
     @property
     def field(self):
         """
             The formfield to represent the block.
+            Built once; StreamField forms and validation access it for every child.
         """
-        return FilerobotField(
-            widget_kwargs=self.widget_kwargs,
-            queryset=self.get_queryset(),
-            required=getattr(self.meta, "required", False),
-            help_text=getattr(self.meta, "help_text", None),
-            validators=getattr(self.meta, "validators", ()),
-        )
+        field = self.__dict__.get("_field")
+        if field is None:
+            field = self._field = FilerobotField(
+                widget_kwargs=self.widget_kwargs,
+                queryset=self.get_queryset(),
+                required=getattr(self.meta, "required", False),
+                help_text=getattr(self.meta, "help_text", None),
+                validators=getattr(self.meta, "validators", ()),
+            )
+        return field
 
     @field.setter
     def field(self, value):
@@ -96,9 +135,9 @@ class FilerobotBlock(blocks.ChooserBlock):
     @property
     def widget(self):
         """
-            The widget to represent the block.
+            The widget to represent the block; the one of its formfield.
         """
-        return FilerobotWidget(**self.widget_kwargs)
+        return self.field.widget
 
     @widget.setter
     def widget(self, value):
@@ -1,5 +1,6 @@
 from typing import Any
 from django.db import models
+from django.utils.functional import cached_property
 from django.db.models.fields.related_descriptors import (
     ForwardManyToOneDescriptor,
 )
@@ -20,19 +21,37 @@ class ForwardFilerobotDescriptor(ForwardManyToOneDescriptor):
 
         This makes sure that the value behaves
         like a wagtail block when it is accessed.
+
+        The value is kept in the instance's field cache next to the image,
+        so every access returns the same value until the image changes.
     """
+    @cached_property
+    def value_cache_name(self) -> str:
+        # `cache_name` is new in Django 5.1.
+        cache_name = getattr(self.field, "cache_name", None) or self.field.get_cache_name()
+        return f"{cache_name}:filerobot_value"
+
     def __set__(self, instance, value):
         if isinstance(value, FilerobotImageValue):
             value = value.image
 
         super().__set__(instance, value)
+        instance._state.fields_cache.pop(self.value_cache_name, None)
 
     def __get__(self, instance, owner) -> FilerobotImageValue:
-        value = super().__get__(instance, owner)
-        if value is None:
+        if instance is None:
+            return self
+
+        image = super().__get__(instance, owner)
+        if image is None:
             return None
-        
-        return FilerobotImageValue.from_image(instance, value)
+
+        # The image itself is dropped from the cache when the FK changes, f.e. in `refresh_from_db`.
+        value = instance._state.fields_cache.get(self.value_cache_name)
+        if value is None or value._image is not image:
+            value = instance._state.fields_cache[self.value_cache_name] = FilerobotImageValue.from_image(instance, image)
+
+        return value
 
 
 class FilerobotField(models.ForeignKey):
@@ -190,12 +209,17 @@ class FilerobotField(models.ForeignKey):
 
         return name, path, args, kwargs
 
+    @cached_property
+    def widget(self) -> FilerobotWidget:
+        # Form fields get a copy; the compiled config is shared.
+        return FilerobotWidget(**self.widget_kwargs)
+
     def formfield(self, **kwargs):
         if "widget" in kwargs:
             del kwargs["widget"]
         
         return super().formfield(
-            widget=FilerobotWidget(**self.widget_kwargs),
+            widget=self.widget,
             **kwargs
         )
 
@@ -44,11 +44,17 @@ class FilerobotField(forms.ModelChoiceField):
 
     @property   
     def widget(self):
-        return FilerobotWidget(**self.widget_kwargs)
+        widget = self.__dict__.get("_widget")
+        if widget is None:
+            widget = self._widget = FilerobotWidget(**self.widget_kwargs)
+        return widget
     
     @widget.setter
     def widget(self, value):
-        pass
+        # Django sets a copy of the widget in `__init__` and `__deepcopy__`;
+        # other widgets are not compatible.
+        if isinstance(value, FilerobotWidget):
+            self._widget = value
 
 
     
@@ -0,0 +1,357 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Sum, Window
+from django.db.models.functions import Length, RowNumber
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+from modelcluster.models import ClusterableModel, get_all_child_relations
+from wagtail.images import get_image_model
+from wagtail.models import Collection, ReferenceIndex, Revision
+
+from filerobot.models import CurrentDesignState, DesignState
+from filerobot.utils.collection import get_filerobot_collection
+
+
+Image = get_image_model()
+Rendition = Image.get_rendition_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Prune old design states and the superseded images left behind by history mode. "
+        "The current design state of an image is never deleted, "
+        "and only images which a newer image was edited from are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep", type=int, default=None,
+            help="Keep the current and N - 1 most recent other design states of every image.",
+        )
+        parser.add_argument(
+            "--older-than", type=int, default=None, metavar="DAYS",
+            help="Only delete design states last updated more than DAYS ago.",
+        )
+        parser.add_argument(
+            "--images", action="store_true",
+            help=(
+                "Delete images in the filerobot collection which were replaced by a newer edit "
+                "and are not referenced anywhere, not even by a revision; "
+                "along with their renditions and design states."
+            ),
+        )
+        parser.add_argument(
+            "--images-older-than", type=int, default=30, metavar="DAYS",
+            help="Only delete images uploaded more than DAYS ago (default: 30).",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of rows deleted per transaction (default: 500).",
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0,
+            help="Seconds to sleep between batches, f.e. to let replicas catch up.",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=8,
+            help="Number of threads deleting files from storage (default: 8).",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report what would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        prune_states = options["keep"] is not None or options["older_than"] is not None
+        if not prune_states and not options["images"]:
+            raise CommandError("Nothing to prune; pass --keep, --older-than and/or --images.")
+
+        if options["keep"] is not None and options["keep"] < 1:
+            raise CommandError("--keep must be at least 1.")
+
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        self.batch_size = options["batch_size"]
+        self.pause = options["pause"]
+        self.dry_run = options["dry_run"]
+        self.verbosity = options["verbosity"]
+
+        if prune_states:
+            self.prune_design_states(
+                keep=options["keep"] or 1,
+                older_than=options["older_than"],
+            )
+
+        if options["images"]:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                self.prune_images(
+                    older_than=options["images_older_than"],
+                    executor=executor,
+                )
+
+    def log(self, message, verbosity = 1):
+        if self.verbosity >= verbosity:
+            self.stdout.write(message)
+
+    def _sleep(self):
+        if self.pause and not self.dry_run:
+            time.sleep(self.pause)
+
+    def _batches(self, pks):
+        for i in range(0, len(pks), self.batch_size):
+            yield pks[i:i + self.batch_size]
+
+    def prune_design_states(self, keep: int, older_than: int = None):
+        """
+            Delete all but the current and the `keep` - 1 most recent other design states of every image,
+            optionally only those last updated more than `older_than` days ago.
+
+            Images are walked in batches by pk, so no query touches the whole table.
+        """
+        ranked = DesignState.objects.annotate(rank=Window(
+            expression=RowNumber(),
+            partition_by=[F("image_id")],
+            # The current state always ranks first; a state added to the history of a deduplicated upload
+            # (see views.widget.save_image) is newer, but does not replace it.
+            order_by=[
+                F("current_for__image").desc(nulls_last=True),
+                F("updated_at").desc(),
+                F("pk").desc(),
+            ],
+        ))
+        pruned = ranked.filter(rank__gt=keep)
+        cutoff = None
+        if older_than is not None:
+            cutoff = timezone.now() - timedelta(days=older_than)
+
+        images = Image.objects.order_by("pk").values_list("pk", flat=True)
+
+        deleted = size = rebased = 0
+        last_image = 0
+        while True:
+            image_ids = list(images.filter(pk__gt=last_image)[:self.batch_size])
+            if not image_ids:
+                break
+            last_image = image_ids[-1]
+
+            # The age is checked here; filtering on it in the query would change the ranking.
+            pks = [
+                pk for pk, updated_at in pruned.filter(image_id__in=image_ids).values_list("pk", "updated_at")
+                if cutoff is None or updated_at < cutoff
+            ]
+            for chunk in self._batches(pks):
+                size += DesignState.objects.filter(pk__in=chunk)\
+                    .aggregate(size=Sum(Length("designstate")))["size"] or 0
+
+                if self.dry_run:
+                    deleted += len(chunk)
+                    continue
+
+                # Deltas which are kept are turned into snapshots first, for the whole chunk at once.
+                chunk_rebased, chunk_deleted = DesignState.objects.filter(pk__in=chunk).rebase_and_delete()
+                rebased += chunk_rebased
+                deleted += chunk_deleted
+
+                self.log(f"Deleted {deleted} design states", verbosity=2)
+                self._sleep()
+
+        verb = "Would delete" if self.dry_run else "Deleted"
+        self.log(f"{verb} {deleted} design states (about {filesizeformat(size)}).")
+        if rebased:
+            self.log(f"Turned {rebased} dependent delta states into snapshots.")
+
+    def get_image_collections(self):
+        root = get_filerobot_collection()
+        if root is None:
+            return Collection.objects.none()
+        return Collection.get_tree(parent=root)
+
+    def get_referenced_images(self, pks: list) -> set:
+        """
+            The pks in `pks` which are referenced by any model, or in Wagtail's reference index.
+            Renditions and design states belong to the image and do not count.
+        """
+        referenced = set()
+        # Hidden relations (`related_name="+"`) are left out of `related_objects`, but reference images all the same.
+        relations = [
+            field for field in Image._meta.get_fields(include_hidden=True)
+            if field.auto_created and not field.concrete
+        ]
+        for relation in relations:
+            if relation.related_model in (DesignState, CurrentDesignState, Rendition):
+                continue
+
+            name = relation.field.name
+            referenced.update(
+                relation.related_model._base_manager\
+                    .filter(**{f"{name}__in": pks})\
+                    .values_list(name, flat=True)
+            )
+
+        referenced.update(
+            int(pk) for pk in ReferenceIndex.objects.filter(
+                to_content_type=ContentType.objects.get_for_model(Image),
+                to_object_id__in=[str(pk) for pk in pks],
+            ).values_list("to_object_id", flat=True)
+        )
+
+        return referenced
+
+    def _get_image_references(self, instance):
+        """
+            The pks of the images `instance` (and its child objects) point to,
+            found the same way Wagtail fills its reference index.
+        """
+        for field in instance._meta.concrete_fields:
+            if field.many_to_one and field.related_model is Image:
+                value = field.value_from_object(instance)
+                if value is not None:
+                    yield value
+
+            elif hasattr(field, "extract_references"):
+                value = field.value_from_object(instance)
+                if value is not None:
+                    for model, pk, _, _ in field.extract_references(value):
+                        if issubclass(model, Image):
+                            yield Image._meta.pk.to_python(pk)
+
+        if isinstance(instance, ClusterableModel):
+            for relation in get_all_child_relations(instance):
+                for child in getattr(instance, relation.get_accessor_name()).all():
+                    yield from self._get_image_references(child)
+
+    def get_revision_images(self) -> set:
+        """
+            The pks of all images used by a revision; drafts and older versions of pages
+            and snippets are not in the reference index.
+
+            Revisions whose object is gone can not be restored, and are skipped.
+            Read once per run, in batches.
+        """
+        if self._revision_images is not None:
+            return self._revision_images
+
+        images = set()
+        revisions = Revision.objects.order_by("pk")
+        last_pk = 0
+        while True:
+            batch = list(revisions.filter(pk__gt=last_pk)[:self.batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            by_type = {}
+            for revision in batch:
+                by_type.setdefault(revision.content_type_id, []).append(revision)
+
+            for content_type_id, type_revisions in by_type.items():
+                model = ContentType.objects.get_for_id(content_type_id).model_class()
+                if model is None:
+                    continue
+
+                objects = model._default_manager.in_bulk({
+                    model._meta.pk.to_python(revision.object_id) for revision in type_revisions
+                })
+                for revision in type_revisions:
+                    instance = objects.get(model._meta.pk.to_python(revision.object_id))
+                    if instance is not None:
+                        images.update(self._get_image_references(
+                            instance.with_content_json(revision.content),
+                        ))
+
+        self._revision_images = images
+        return images
+
+    def prune_images(self, older_than: int, executor: ThreadPoolExecutor):
+        """
+            Delete superseded images from the filerobot collection, which are left behind
+            by every save when history is enabled.
+
+            An image is superseded once a newer image was edited from it;
+            images which were never edited further are the current version of something, and are kept.
+            So are images referenced anywhere, including any revision.
+
+            Their files and renditions are deleted from storage in `executor` once the batch is committed.
+        """
+        superseded = DesignState.objects.filter(
+            # States saved before `source_image` existed only link images through delta bases.
+            Q(source_image=OuterRef("pk")) | Q(base__image=OuterRef("pk")),
+            image__created_at__gt=OuterRef("created_at"),
+        ).exclude(image=OuterRef("pk"))
+
+        candidates = Image.objects.filter(
+            Exists(superseded),
+            collection__in=self.get_image_collections(),
+            created_at__lt=timezone.now() - timedelta(days=older_than),
+        ).order_by("pk")
+
+        image_storage = Image._meta.get_field("file").storage
+        rendition_storage = Rendition._meta.get_field("file").storage
+
+        self._revision_images = None
+        deleted = renditions = size = failed = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                candidates.filter(pk__gt=last_pk)\
+                    .only("pk", "file", "file_size")[:self.batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            referenced = self.get_referenced_images([image.pk for image in batch])
+            images = [image for image in batch if image.pk not in referenced]
+            if images:
+                revision_images = self.get_revision_images()
+                images = [image for image in images if image.pk not in revision_images]
+            if not images:
+                continue
+
+            pks = [image.pk for image in images]
+            rendition_files = list(
+                Rendition.objects.filter(image_id__in=pks).values_list("file", flat=True)
+            )
+
+            deleted += len(images)
+            renditions += len(rendition_files)
+            size += sum(image.file_size or 0 for image in images)
+
+            if self.dry_run:
+                continue
+
+            files = [(image_storage, image.file.name) for image in images]
+            files += [(rendition_storage, name) for name in rendition_files]
+            results = []
+            with transaction.atomic():
+                # Registered before the delete, so the files are deleted concurrently
+                # before Wagtail's own cleanup of every image and rendition runs, which then has nothing left to do.
+                transaction.on_commit(lambda: results.extend(executor.map(self._delete_file, files)))
+                Image.objects.filter(pk__in=pks).delete()
+            failed += results.count(False)
+
+            self.log(f"Deleted {deleted} images", verbosity=2)
+            self._sleep()
+
+        verb = "Would delete" if self.dry_run else "Deleted"
+        self.log(f"{verb} {deleted} images (about {filesizeformat(size)}) and {renditions} renditions.")
+        if failed:
+            self.stderr.write(f"Failed to delete {failed} files from storage.")
+
+    def _delete_file(self, file) -> bool:
+        storage, name = file
+        if not name:
+            return True
+
+        try:
+            storage.delete(name)
+        except Exception as e:
+            self.stderr.write(f"Could not delete {name}: {e}")
+            return False
+        return True
@@ -0,0 +1,196 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from treebeard.exceptions import PathOverflow
+from treebeard.numconv import NumConv
+from wagtail.models import Collection
+
+from filerobot.models import UserCollection
+from filerobot.utils.collection import (
+    _tree_lock,
+    chooser_collection_ids,
+    get_filerobot_collection,
+    get_user_collection_name,
+)
+from filerobot import (
+    FILEROBOT_ORIGINALS_COLLECTION_NAME,
+)
+
+
+_numconv = NumConv(Collection.alphabet)
+
+
+def _child_path(path: str, position: int) -> str:
+    if position >= len(Collection.alphabet) ** Collection.steplen:
+        raise PathOverflow(f"Path Overflow from: '{path}'")
+    return path + _numconv.int2str(position).rjust(Collection.steplen, Collection.alphabet[0])
+
+
+def _position(path: str) -> int:
+    return _numconv.str2int(path[-Collection.steplen:])
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the `username` > `originals` collections for all users who do not have them yet. "
+        "See FILEROBOT_USER_COLLECTIONS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of users provisioned per transaction (default: 500).",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report how many users would be provisioned.",
+        )
+
+    def handle(self, *args, **options):
+        root = get_filerobot_collection()
+        if root is None:
+            raise CommandError("No filerobot collection found; run manage.py migrate first.")
+
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        User = get_user_model()
+        users = User._default_manager\
+            .exclude(pk__in=UserCollection.objects.values("user_id"))\
+            .order_by("pk")
+
+        if options["dry_run"]:
+            self.stdout.write(f"Would provision collections for {users.count()} users.")
+            return
+
+        provisioned = 0
+        last_pk = None
+        while True:
+            batch = users if last_pk is None else users.filter(pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            provisioned += self.provision(root, batch)
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"Provisioned {provisioned} users")
+
+        self.stdout.write(f"Provisioned collections for {provisioned} users.")
+
+    def provision(self, root: Collection, users: list) -> int:
+        """
+            Create the collections of `users` with two bulk inserts,
+            instead of two treebeard writes (each locking and updating the tree) per user.
+
+            Users whose name is already taken by a child of the root get their pk appended,
+            like `create_user_collections` does.
+
+            The new collections are inserted after the existing ones and then moved into name order;
+            see `sort_children`.
+        """
+        with _tree_lock, transaction.atomic():
+            root = Collection.objects.select_for_update().get(pk=root.pk)
+
+            # Someone may have used the chooser in the meantime.
+            done = set(
+                UserCollection.objects.filter(user__in=users).values_list("user_id", flat=True)
+            )
+            users = [user for user in users if user.pk not in done]
+            if not users:
+                return 0
+
+            taken = set(
+                root.get_children()\
+                    .filter(name__in=[user.get_username() for user in users])\
+                    .values_list("name", flat=True)
+            )
+
+            # New collections go past every position the children end up at,
+            # `sort_children` moves them into place afterwards.
+            last_child = root.get_last_child()
+            position = max(
+                _position(last_child.path) if last_child else 0,
+                root.numchild + len(users),
+            )
+            depth = root.depth + 1
+
+            collections = []
+            paths = []
+            for position, user in enumerate(users, start=position + 1):
+                path = _child_path(root.path, position)
+                originals_path = _child_path(path, 1)
+                collections += [
+                    Collection(name=get_user_collection_name(user, taken), path=path, depth=depth, numchild=1),
+                    Collection(name=FILEROBOT_ORIGINALS_COLLECTION_NAME, path=originals_path, depth=depth + 1, numchild=0),
+                ]
+                paths.append((user, path, originals_path))
+
+            Collection.objects.bulk_create(collections)
+            Collection.objects.filter(pk=root.pk).update(
+                numchild=F("numchild") + len(paths),
+            )
+            # `get_children()` returns nothing for a root it thinks is a leaf.
+            root.numchild += len(paths)
+
+            # Not every database returns the pks from bulk_create.
+            by_path = dict(
+                Collection.objects.filter(
+                    path__in=[collection.path for collection in collections],
+                ).values_list("path", "pk")
+            )
+            UserCollection.objects.bulk_create([
+                UserCollection(
+                    user=user,
+                    collection_id=by_path[path],
+                    originals_id=by_path[originals_path],
+                )
+                for user, path, originals_path in paths
+            ])
+
+            self.sort_children(root)
+
+        # bulk_create sends no post_save, which would have done this.
+        chooser_collection_ids.invalidate()
+
+        return len(paths)
+
+    def sort_children(self, root: Collection):
+        """
+            Number the children of `root` in name order, as treebeard's sorted inserts
+            (`Collection.node_order_by`) expect them to be; else the next `add_child` collides with an existing path.
+
+            The database orders the names, so its collation is the one treebeard compares with.
+            Only children which are out of place are moved, each with their subtree in a single update.
+        """
+        children = list(
+            root.get_children().order_by("name", "path").values_list("path", flat=True)
+        )
+        moves = {
+            path: _child_path(root.path, position)
+            for position, path in enumerate(children, start=1)
+        }
+        moves = {path: target for path, target in moves.items() if path != target}
+        if not moves:
+            return
+
+        # Paths are unique; children in the way of another's target are first moved past all positions in use.
+        top = max(_position(path) for path in children)
+        temporary = 0
+        for path in list(moves):
+            if _position(path) <= len(children):
+                temporary += 1
+                temporary_path = _child_path(root.path, top + temporary)
+                self.move_subtree(path, temporary_path)
+                moves[temporary_path] = moves.pop(path)
+
+        for path, target in moves.items():
+            self.move_subtree(path, target)
+
+    def move_subtree(self, path: str, target: str):
+        Collection.objects.filter(path__startswith=path).update(
+            path=Concat(Value(target), Substr("path", len(path) + 1)),
+        )
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filerobot', '0002_alter_designstate_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='designstate',
+            name='base',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='filerobot.designstate', verbose_name='Base'),
+        ),
+        migrations.AddField(
+            model_name='designstate',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Depth'),
+        ),
+        migrations.AddField(
+            model_name='designstate',
+            name='snapshot',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='filerobot.designstate', verbose_name='Snapshot'),
+        ),
+    ]
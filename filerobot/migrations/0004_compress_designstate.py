@@ -0,0 +1,76 @@
+from django.db import migrations
+
+import filerobot.utils.compression
+
+
+BATCH_SIZE = 1000
+
+
+def compress_design_states(apps, schema_editor):
+    DesignState = apps.get_model("filerobot", "DesignState")
+    db_alias = schema_editor.connection.alias
+
+    last_pk = 0
+    while True:
+        batch = list(
+            DesignState.objects.using(db_alias)\
+                .filter(pk__gt=last_pk)\
+                .order_by("pk")\
+                .only("pk", "designstate")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        for state in batch:
+            # String values are parsed by the field, so they are no longer encoded twice.
+            state.compressed_designstate = state.designstate
+
+        DesignState.objects.using(db_alias).bulk_update(batch, ["compressed_designstate"])
+        last_pk = batch[-1].pk
+
+
+def decompress_design_states(apps, schema_editor):
+    DesignState = apps.get_model("filerobot", "DesignState")
+    db_alias = schema_editor.connection.alias
+
+    last_pk = 0
+    while True:
+        batch = list(
+            DesignState.objects.using(db_alias)\
+                .filter(pk__gt=last_pk)\
+                .order_by("pk")\
+                .only("pk", "compressed_designstate")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        for state in batch:
+            state.designstate = state.compressed_designstate
+
+        DesignState.objects.using(db_alias).bulk_update(batch, ["designstate"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filerobot', '0003_designstate_base_designstate_depth_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='designstate',
+            name='compressed_designstate',
+            field=filerobot.utils.compression.CompressedJSONField(default=dict, verbose_name='Design State'),
+        ),
+        migrations.RunPython(compress_design_states, decompress_design_states),
+        migrations.RemoveField(
+            model_name='designstate',
+            name='designstate',
+        ),
+        migrations.RenameField(
+            model_name='designstate',
+            old_name='compressed_designstate',
+            new_name='designstate',
+        ),
+    ]
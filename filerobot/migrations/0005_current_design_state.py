@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+BATCH_SIZE = 1000
+
+
+def set_current_design_states(apps, schema_editor):
+    DesignState = apps.get_model("filerobot", "DesignState")
+    CurrentDesignState = apps.get_model("filerobot", "CurrentDesignState")
+    db_alias = schema_editor.connection.alias
+
+    images = DesignState.objects.using(db_alias)\
+        .order_by("image_id")\
+        .values_list("image_id", flat=True)\
+        .distinct()
+
+    latest = DesignState.objects.using(db_alias)\
+        .filter(image_id=OuterRef("image_id"))\
+        .order_by("-updated_at", "-pk")\
+        .values("pk")[:1]
+
+    last_image = None
+    while True:
+        batch = images if last_image is None else images.filter(image_id__gt=last_image)
+        image_ids = list(batch[:BATCH_SIZE])
+        if not image_ids:
+            break
+        last_image = image_ids[-1]
+
+        states = DesignState.objects.using(db_alias)\
+            .filter(image_id__in=image_ids, pk=Subquery(latest))\
+            .values_list("image_id", "pk")
+
+        CurrentDesignState.objects.using(db_alias).bulk_create([
+            CurrentDesignState(image_id=image_id, state_id=state_id)
+            for image_id, state_id in states
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filerobot', '0004_compress_designstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentDesignState',
+            fields=[
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='current_design_state', serialize=False, to='wagtailimages.image')),
+            ],
+            options={
+                'verbose_name': 'Current Design State',
+                'verbose_name_plural': 'Current Design States',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='designstate',
+            index=models.Index(fields=['image', '-updated_at'], name='filerobot_ds_image_updated'),
+        ),
+        migrations.AddField(
+            model_name='currentdesignstate',
+            name='state',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='current_for', to='filerobot.designstate', verbose_name='Design State'),
+        ),
+        migrations.RunPython(set_current_design_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('filerobot', '0005_current_design_state'),
+        ('wagtailcore', '0025_collection_initial_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCollection',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='filerobot_collections', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+                ('collection', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wagtailcore.collection', verbose_name='Collection')),
+                ('originals', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wagtailcore.collection', verbose_name='Originals')),
+            ],
+            options={
+                'verbose_name': 'User Collection',
+                'verbose_name_plural': 'User Collections',
+            },
+        ),
+    ]
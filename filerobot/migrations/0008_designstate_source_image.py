@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filerobot', '0006_usercollection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='designstate',
+            name='source_image',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='wagtailimages.image', verbose_name='Source image'),
+        ),
+    ]
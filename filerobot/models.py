@@ -1,7 +1,19 @@
-from typing import TYPE_CHECKING
-from django.db import models
+import json
+import contextvars
+from typing import TYPE_CHECKING, Iterable
+from django.conf import settings
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from wagtail.images import get_image_model
+from wagtail.models import Collection
+
+from .utils.compression import CompressedJSONField
+from .utils.jsonpatch import make_patch, apply_patch
+from filerobot import (
+    FILEROBOT_DESIGN_STATE_COMPRESSION as DESIGN_STATE_COMPRESSION,
+    FILEROBOT_DESIGN_STATE_DELTAS as DESIGN_STATE_DELTAS,
+    FILEROBOT_DESIGN_STATE_SNAPSHOT_INTERVAL as DESIGN_STATE_SNAPSHOT_INTERVAL,
+)
 
 if TYPE_CHECKING:
     from wagtail.images.models import (
@@ -13,17 +25,309 @@ if TYPE_CHECKING:
 Image = get_image_model()
 
 
+# Set while `DesignStateQuerySet.rebase_and_delete` deletes states whose dependents were rebased in bulk;
+# the pre_delete signal then skips its per-state rebase. See signals.py.
+dependents_rebased = contextvars.ContextVar("filerobot_dependents_rebased", default=False)
+
+
+def _parse_design_state(design_state):
+    """
+        The widget posts the design state as a JSON encoded string.
+    """
+    if isinstance(design_state, str):
+        try:
+            return json.loads(design_state)
+        except ValueError:
+            pass
+    return design_state
+
+
+def _resolve_members(members: dict, pks: Iterable[int]) -> dict:
+    """
+        Rebuild the full design state for `pks` from `members`;
+        a dict of all states (by pk) needed to walk back to their snapshots.
+
+        States whose chain is broken resolve to None.
+    """
+    resolved = {}
+    for pk in pks:
+        path = []
+        state = members.get(pk)
+        while state is not None and state.pk not in resolved and state.snapshot_id is not None:
+            path.append(state)
+            state = members.get(state.base_id)
+
+        if state is None:
+            resolved[pk] = None
+            continue
+
+        if state.pk in resolved:
+            doc = resolved[state.pk]
+        else:
+            doc = _parse_design_state(state.designstate)
+            resolved[state.pk] = doc
+
+        for delta in reversed(path):
+            if doc is not None:
+                doc = apply_patch(doc, delta.designstate)
+            resolved[delta.pk] = doc
+
+    return resolved
+
+
+def _source_image_id(image, base_image):
+    """
+        The pk of the image `image` was edited from, if it is another image.
+    """
+    pk = getattr(base_image, "pk", base_image)
+    if pk is None or pk == getattr(image, "pk", image):
+        return None
+    return pk
+
+
+class DesignStateQuerySet(models.QuerySet):
+    def current(self):
+        """
+            Only the latest design state of every image; see `CurrentDesignState`.
+        """
+        return self.filter(current_for__isnull=False)
+
+    def latest_for(self, image) -> "DesignState":
+        """
+            The latest design state saved for an image (or image ID).
+        """
+        return self.filter(current_for__image=image).first()
+
+    async def alatest_for(self, image) -> "DesignState":
+        return await self.filter(current_for__image=image).afirst()
+
+    def set_current(self, image):
+        """
+            Point the `CurrentDesignState` of `image` (or image ID) back to its latest state,
+            f.e. after the current state was deleted.
+        """
+        state = self.model.objects.filter(image=image)\
+            .order_by("-updated_at", "-pk")\
+            .only("pk", "image")\
+            .first()
+
+        if state is not None:
+            CurrentDesignState.objects.point_to(state)
+
+    def resolve(self, states: Iterable["DesignState"]) -> dict:
+        """
+            Rebuild the full design states for `states`, keyed by pk.
+
+            Deltas are resolved with a single query for all snapshots
+            and intermediate deltas they depend on.
+        """
+        states = list(states)
+        members = {state.pk: state for state in states}
+
+        snapshots = {state.snapshot_id for state in states if state.snapshot_id}
+        if snapshots:
+            max_depth = max(state.depth for state in states)
+            chain = self.model.objects.filter(
+                models.Q(pk__in=snapshots)\
+                | models.Q(snapshot_id__in=snapshots, depth__lt=max_depth)
+            )
+            for state in chain:
+                members.setdefault(state.pk, state)
+
+        return _resolve_members(members, [state.pk for state in states])
+
+    def create_state(self, image, design_state, base_image = None, current: bool = True) -> "DesignState":
+        """
+            Save a new design state for `image`.
+
+            If `FILEROBOT_DESIGN_STATE_DELTAS` is set the state is stored as a JSON patch against
+            the latest state of `image`, or else of `base_image` (the image it was edited from).
+            Every `FILEROBOT_DESIGN_STATE_SNAPSHOT_INTERVAL` states a full snapshot is stored.
+            Otherwise the current state of `image` is updated in place.
+
+            With `current=False` the state is only added to the history of `image`;
+            what `latest_for` returns for it stays the same. Nothing is added if it equals
+            the current or latest state of `image`, and without deltas an image keeps
+            a single such state besides its current one.
+        """
+        design_state = _parse_design_state(design_state)
+        with transaction.atomic():
+            if not current:
+                state = self._add_to_history(image, design_state, base_image)
+                if state is not None:
+                    return state
+
+            elif not DESIGN_STATE_DELTAS:
+                # Without deltas an image keeps a single state, updated in place.
+                state = self.select_for_update().filter(current_for__image=image).first()
+                if state is not None:
+                    return self._update_state(state, image, design_state, base_image)
+
+            state = self._create_state(image, design_state, base_image)
+            if current:
+                CurrentDesignState.objects.point_to(state)
+        return state
+
+    def _add_to_history(self, image, design_state, base_image = None) -> "DesignState":
+        # Deduplicated uploads (see views.widget.save_image) are mostly the same image saved again unchanged.
+        latest = self.select_for_update()\
+            .filter(image=image, current_for__isnull=True)\
+            .order_by("-updated_at", "-pk")\
+            .first()
+        states = [state for state in (self.latest_for(image), latest) if state is not None]
+        resolved = self.resolve(states)
+        for state in states:
+            if resolved[state.pk] == design_state:
+                return state
+
+        if latest is not None and not DESIGN_STATE_DELTAS:
+            return self._update_state(latest, image, design_state, base_image)
+
+        return None
+
+    def _update_state(self, state: "DesignState", image, design_state, base_image = None) -> "DesignState":
+        # Deltas saved while FILEROBOT_DESIGN_STATE_DELTAS was on may depend on it.
+        self.rebase_dependents([state])
+
+        state.designstate = design_state
+        state.base = None
+        state.snapshot = None
+        state.depth = 0
+        # Saving an image in place again keeps where it was first edited from.
+        state.source_image_id = _source_image_id(image, base_image) or state.source_image_id
+        state.save(update_fields=["designstate", "base", "snapshot", "depth", "source_image", "updated_at"])
+        return state
+
+    def _create_state(self, image, design_state, base_image = None) -> "DesignState":
+        source_image_id = _source_image_id(image, base_image)
+        if not DESIGN_STATE_DELTAS:
+            return self.create(image=image, designstate=design_state, source_image_id=source_image_id)
+
+        base = self.latest_for(image)
+        if base is None and base_image is not None:
+            base = self.latest_for(base_image)
+
+        if base is not None and base.depth + 1 < DESIGN_STATE_SNAPSHOT_INTERVAL:
+            base_state = self.resolve([base]).get(base.pk)
+            if base_state is not None:
+                patch = make_patch(base_state, design_state)
+
+                # Large rewrites are cheaper to store (and read) in full.
+                if len(json.dumps(patch)) < len(json.dumps(design_state)):
+                    return self.create(
+                        image=image,
+                        designstate=patch,
+                        base=base,
+                        snapshot_id=base.snapshot_id or base.pk,
+                        depth=base.depth + 1,
+                        source_image_id=source_image_id,
+                    )
+
+        return self.create(image=image, designstate=design_state, source_image_id=source_image_id)
+
+    def rebase_and_delete(self) -> tuple:
+        """
+            Delete these states, rebasing everything depending on them with one `rebase_dependents` call
+            instead of one per state (which the pre_delete signal does for a regular `delete()`).
+
+            Returns the number of states rebased and deleted.
+        """
+        with transaction.atomic():
+            pks = list(self.values_list("pk", flat=True))
+            rebased = self.model.objects.rebase_dependents(pks)
+
+            token = dependents_rebased.set(True)
+            try:
+                deleted = self.model.objects.filter(pk__in=pks).delete()[1].get(self.model._meta.label, 0)
+            finally:
+                dependents_rebased.reset(token)
+
+        return rebased, deleted
+
+    def rebase_dependents(self, states: Iterable["DesignState"]) -> int:
+        """
+            Turn the deltas depending on `states` (or their pks) into snapshots,
+            so they can still be resolved after `states` are deleted.
+
+            States further down their chains are moved onto the new snapshots.
+            Returns the number of states updated.
+        """
+        pks = {getattr(state, "pk", state) for state in states}
+
+        # Read the groups from the database; a previous rebase
+        # in the same delete may have moved these states already.
+        groups = {
+            snapshot_id or pk
+            for pk, snapshot_id in self.model.objects.filter(pk__in=pks).values_list("pk", "snapshot_id")
+        }
+        if not groups:
+            return 0
+
+        members = {
+            state.pk: state
+            for state in self.model.objects.filter(
+                models.Q(pk__in=groups) | models.Q(snapshot_id__in=groups),
+            )
+        }
+
+        # Find the topmost state every dependent can still be resolved from.
+        tops = {}
+        for state in members.values():
+            if state.pk in pks or state.snapshot_id is None:
+                continue
+
+            node = state
+            while node is not None and node.snapshot_id is not None and node.base_id not in pks:
+                node = members.get(node.base_id)
+
+            if node is not None and node.snapshot_id is not None:
+                tops[state.pk] = node
+
+        if not tops:
+            return 0
+
+        top_states = {top.pk: top for top in tops.values()}
+        full_states = _resolve_members(members, top_states)
+        top_depths = {pk: top.depth for pk, top in top_states.items()}
+
+        updated = []
+        for pk, top in tops.items():
+            # Broken chains can not be recovered; leave them as they are.
+            if full_states[top.pk] is None:
+                continue
+
+            state = members[pk]
+            if pk == top.pk:
+                state.designstate = full_states[pk]
+                state.base = None
+                state.snapshot = None
+                state.depth = 0
+            else:
+                state.snapshot_id = top.pk
+                state.depth -= top_depths[top.pk]
+            updated.append(state)
+
+        if updated:
+            self.model.objects.bulk_update(
+                updated, ["designstate", "base", "snapshot", "depth"],
+            )
+        return len(updated)
+
 class DesignState(models.Model):
     """
         Model to store the design state of an image.
-        
+
         This is so the user can continue editing the image
         where they left off after saving the page.
 
-        The design state is stored as a JSON field.
-        
+        The design state is stored as compressed JSON, see `utils.compression`.
+        It is decompressed when `designstate` is first accessed.
+
         This gets passed to the javascript widget
         when it fetches the image from `views.file_view`.
+
+        If `snapshot` is set, `designstate` holds a JSON patch against `base`
+        and `get_design_state` must be used to read the full state.
     """
 
     image: "WagtailImage" = models.ForeignKey(
@@ -32,9 +336,49 @@ class DesignState(models.Model):
         related_name="design_state",
     )
 
-    designstate: dict = models.JSONField(
+    designstate: dict = CompressedJSONField(
         verbose_name=_("Design State"),
         default=dict,
+        codec=DESIGN_STATE_COMPRESSION,
+    )
+
+    # Dependent deltas are rebased by a pre_delete signal before a state is removed;
+    # see signals.py. Django's own on_delete handling would run after that.
+    base: "DesignState" = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        verbose_name=_("Base"),
+    )
+
+    snapshot: "DesignState" = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        verbose_name=_("Snapshot"),
+    )
+
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_("Depth"),
+    )
+
+    # The image the editor started from when this state was saved;
+    # `filerobot_prune` only deletes images which a newer one was edited from.
+    source_image: "WagtailImage" = models.ForeignKey(
+        Image,
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        verbose_name=_("Source image"),
     )
 
     created_at = models.DateTimeField(
@@ -47,8 +391,117 @@ class DesignState(models.Model):
         verbose_name=_("Updated at"),
     )
 
+    objects = DesignStateQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Design State")
         verbose_name_plural = _("Design States")
         ordering = ("-updated_at",)
-        
+        indexes = [
+            models.Index(fields=["image", "-updated_at"], name="filerobot_ds_image_updated"),
+        ]
+
+    @property
+    def is_delta(self) -> bool:
+        return self.snapshot_id is not None
+
+    def get_design_state(self):
+        """
+            The full design state, rebuilt from its snapshot if this is a delta.
+        """
+        if not self.is_delta:
+            return self.designstate
+
+        return DesignState.objects.resolve([self])[self.pk]
+
+    def rebase_dependents(self):
+        """
+            Turn the deltas based on this state into snapshots,
+            so they can still be resolved after this state is deleted.
+
+            See `DesignStateQuerySet.rebase_dependents`.
+        """
+        return DesignState.objects.rebase_dependents([self])
+
+
+class CurrentDesignStateQuerySet(models.QuerySet):
+    def point_to(self, state: DesignState):
+        """
+            Make `state` the current design state of its image, in a single upsert.
+        """
+        self.bulk_create(
+            [self.model(image_id=state.image_id, state=state)],
+            update_conflicts=True,
+            unique_fields=["image"],
+            update_fields=["state"],
+        )
+
+
+class CurrentDesignState(models.Model):
+    """
+        Points to the latest design state of an image.
+
+        This is kept up to date by `DesignStateQuerySet.create_state`,
+        so the widget can load an image's state with a single lookup
+        instead of sorting all of its states.
+
+        If the current state is deleted this row goes with it,
+        and is pointed to the next latest state (see signals.py).
+    """
+
+    image: "WagtailImage" = models.OneToOneField(
+        Image,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="current_design_state",
+    )
+
+    state: DesignState = models.OneToOneField(
+        DesignState,
+        on_delete=models.CASCADE,
+        related_name="current_for",
+        verbose_name=_("Design State"),
+    )
+
+    objects = CurrentDesignStateQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Current Design State")
+        verbose_name_plural = _("Current Design States")
+
+
+class UserCollection(models.Model):
+    """
+        The collections of a user, when `FILEROBOT_USER_COLLECTIONS` is enabled:
+        `FILEROBOT_COLLECTION_NAME` > `username` > `originals`.
+
+        Collections are matched to users by this model rather than by name,
+        so renaming either one does not lose the link.
+        See utils.collection.get_user_collections.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="filerobot_collections",
+        verbose_name=_("User"),
+    )
+
+    collection: Collection = models.OneToOneField(
+        Collection,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("Collection"),
+    )
+
+    originals: Collection = models.OneToOneField(
+        Collection,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("Originals"),
+    )
+
+    class Meta:
+        verbose_name = _("User Collection")
+        verbose_name_plural = _("User Collections")
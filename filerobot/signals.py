@@ -1,10 +1,27 @@
-from django.db.models.signals import post_migrate, post_save
-from django.core.cache import cache
-from wagtail.models import Collection
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from wagtail.images import get_image_model
+from wagtail.models import Collection, GroupCollectionPermission
+from .models import CurrentDesignState, DesignState, UserCollection, dependents_rebased
+from .value import ImageIdentityMap
+from .widgets.filerobot import activate_inline_configs, deactivate_inline_configs
+from .utils.fragments import fragment_generations
+from .utils.collection import (
+    filerobot_collection,
+    originals_collection,
+    user_collections,
+    chooser_collection_ids,
+    collection_generations,
+    ALL_COLLECTIONS,
+    is_filerobot_collection,
+    is_originals_collection,
+)
 from filerobot import (
     FILEROBOT_COLLECTION_NAME,
-    FILEROBOT_COLLECTION_CACHE_KEY,
-    FILEROBOT_COLLECTION_CACHE_TIMEOUT,
+    FILEROBOT_CHOOSER_CACHE,
+    FILEROBOT_FRAGMENT_CACHE,
 )
 
 
@@ -16,32 +33,191 @@ def create_filerobot_collection(sender, **kwargs):
     """
     root: Collection = Collection.objects.filter(depth=1, name=FILEROBOT_COLLECTION_NAME).first()
     if root is None:
-        root = Collection.add_root(
+        # The post_save signal below resets the cache.
+        Collection.add_root(
             name=FILEROBOT_COLLECTION_NAME,
         )
     
-    cache.set(
-        FILEROBOT_COLLECTION_CACHE_KEY,
-        root.pk,
-        FILEROBOT_COLLECTION_CACHE_TIMEOUT,
-    )
-    
 
 def reset_filerobot_collection_cache(sender, instance, **kwargs):
     """
-        Resets the filerobot collection cache.
-        See views.py for usage.
+        Resets the filerobot (or originals) collection cache when that root collection changes.
+        Saving any other collection leaves it alone.
+        See utils/collection.py for usage.
+    """
+    if is_filerobot_collection(instance):
+        filerobot_collection.invalidate()
+
+    if is_originals_collection(instance):
+        originals_collection.invalidate()
+    
+
+def reset_user_collections_cache(sender, instance, created = False, **kwargs):
+    """
+        User collections are only ever added by us;
+        any other change (a rename, a delete) resets the cached user collections.
+    """
+    if created:
+        return
+
+    if sender is UserCollection or instance.depth > 1:
+        user_collections.invalidate()
+
+
+def reset_chooser_collections_cache(sender, **kwargs):
+    """
+        The collections a user may choose from depend on the collection tree,
+        group collection permissions and group membership.
+    """
+    chooser_collection_ids.invalidate()
+
+
+def remember_image_collection(sender, instance, raw = False, update_fields = None, **kwargs):
+    """
+        Look up the collection an image is saved from, so moving it drops the cached chooser pages of both.
     """
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and "collection" not in update_fields:
+        return
+
+    instance._filerobot_previous_collection_id = sender._base_manager\
+        .filter(pk=instance.pk)\
+        .values_list("collection_id", flat=True)\
+        .first()
 
-    if instance.name == FILEROBOT_COLLECTION_NAME and instance.depth == 1:
-        cache.delete(FILEROBOT_COLLECTION_CACHE_KEY)
 
-    cache.set(
-        FILEROBOT_COLLECTION_CACHE_KEY,
-        instance.pk,
-        FILEROBOT_COLLECTION_CACHE_TIMEOUT,
+def bump_collection_generation(sender, instance, **kwargs):
+    """
+        Drop the cached chooser pages showing this image (or collection).
+        Done after commit, so a page rendered in between can not be cached under the new generation.
+        See FILEROBOT_CHOOSER_CACHE.
+    """
+    if sender is Collection:
+        collections = {instance.pk}
+    else:
+        collections = {instance.collection_id, getattr(instance, "_filerobot_previous_collection_id", None)}
+
+    collections = [ALL_COLLECTIONS, *(pk for pk in collections if pk is not None)]
+    transaction.on_commit(
+        lambda: collection_generations.bump(*collections),
+    )
+
+
+def bump_tagged_image_generation(sender, instance, action, **kwargs):
+    """
+        The chooser shows and filters on tags; (un)tagging an image drops its pages like saving it does.
+        Taggit only sends these from the tagged object's side.
+    """
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, get_image_model()):
+        bump_collection_generation(get_image_model(), instance)
+
+
+def bump_rendition_generation(sender, instance, **kwargs):
+    """
+        Cached pages link to the thumbnail renditions of their images.
+    """
+    collection_id = get_image_model()._base_manager\
+        .filter(pk=instance.image_id)\
+        .values_list("collection_id", flat=True)\
+        .first()
+
+    collections = [ALL_COLLECTIONS, *([collection_id] if collection_id is not None else [])]
+    transaction.on_commit(
+        lambda: collection_generations.bump(*collections),
     )
-    
+
+
+def reset_fragment_cache(sender, instance, **kwargs):
+    """
+        Drop the cached fragments of an image when it or one of its renditions changes.
+        Done after commit, like bump_collection_generation. See FILEROBOT_FRAGMENT_CACHE.
+    """
+    image_id = instance.pk if sender is get_image_model() else instance.image_id
+    transaction.on_commit(
+        lambda: fragment_generations.bump(image_id),
+    )
+
+
+def rebase_design_state_dependents(sender, instance, **kwargs):
+    """
+        Keep delta-encoded design states readable when the state they depend on is deleted.
+        See models.DesignState.rebase_dependents.
+    """
+    # `DesignStateQuerySet.rebase_and_delete` already rebased them all at once.
+    if dependents_rebased.get():
+        return
+
+    instance.rebase_dependents()
+
+
+def reset_current_design_state(sender, instance, **kwargs):
+    """
+        Point an image back to its latest design state when its current one is deleted.
+        Done after commit; the image's other states may be going in the same delete.
+    """
+    image_id = instance.image_id
+    transaction.on_commit(
+        lambda: DesignState.objects.set_current(image_id),
+    )
+
+
+def activate_image_identity_map(sender, **kwargs):
+    """
+        Image values created while handling a request share one identity map,
+        so the images they reference are loaded together. See value.ImageIdentityMap.
+    """
+    ImageIdentityMap.activate()
+
+
+def deactivate_image_identity_map(sender, **kwargs):
+    ImageIdentityMap.deactivate()
+
+
+def track_inline_widget_configs(sender, **kwargs):
+    """
+        Widgets write their config inline once per response. See widgets.filerobot.FilerobotWidget.get_context.
+    """
+    activate_inline_configs()
+
+
+def untrack_inline_widget_configs(sender, **kwargs):
+    deactivate_inline_configs()
+
 
 post_migrate.connect(create_filerobot_collection)
 post_save.connect(reset_filerobot_collection_cache, sender=Collection)
+post_delete.connect(reset_filerobot_collection_cache, sender=Collection)
+post_save.connect(reset_user_collections_cache, sender=Collection)
+post_delete.connect(reset_user_collections_cache, sender=Collection)
+post_delete.connect(reset_user_collections_cache, sender=UserCollection)
+post_save.connect(reset_chooser_collections_cache, sender=Collection)
+post_delete.connect(reset_chooser_collections_cache, sender=Collection)
+post_save.connect(reset_chooser_collections_cache, sender=GroupCollectionPermission)
+post_delete.connect(reset_chooser_collections_cache, sender=GroupCollectionPermission)
+
+# Custom user models do not need to have groups.
+if hasattr(get_user_model(), "groups"):
+    m2m_changed.connect(reset_chooser_collections_cache, sender=get_user_model().groups.through)
+pre_delete.connect(rebase_design_state_dependents, sender=DesignState)
+post_delete.connect(reset_current_design_state, sender=CurrentDesignState)
+request_started.connect(activate_image_identity_map)
+request_finished.connect(deactivate_image_identity_map)
+request_started.connect(track_inline_widget_configs)
+request_finished.connect(untrack_inline_widget_configs)
+
+if FILEROBOT_CHOOSER_CACHE:
+    pre_save.connect(remember_image_collection, sender=get_image_model())
+    post_save.connect(bump_collection_generation, sender=get_image_model())
+    post_delete.connect(bump_collection_generation, sender=get_image_model())
+    # Collection names are shown on the pages too.
+    post_save.connect(bump_collection_generation, sender=Collection)
+    post_delete.connect(bump_collection_generation, sender=Collection)
+    m2m_changed.connect(bump_tagged_image_generation, sender=get_image_model().tags.through)
+    post_delete.connect(bump_rendition_generation, sender=get_image_model().get_rendition_model())
+
+if FILEROBOT_FRAGMENT_CACHE:
+    post_save.connect(reset_fragment_cache, sender=get_image_model())
+    post_delete.connect(reset_fragment_cache, sender=get_image_model())
+    # Fragments link to rendition files.
+    post_delete.connect(reset_fragment_cache, sender=get_image_model().get_rendition_model())
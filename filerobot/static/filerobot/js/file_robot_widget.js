@@ -1,22 +1,31 @@
-function base64toBlob(base64Data, contentType) {
-    contentType = contentType || '';
-    var sliceSize = 1024;
-    var byteCharacters = atob(base64Data);
-    var bytesLength = byteCharacters.length;
-    var slicesCount = Math.ceil(bytesLength / sliceSize);
-    var byteArrays = new Array(slicesCount);
-
-    for (var sliceIndex = 0; sliceIndex < slicesCount; ++sliceIndex) {
-        var begin = sliceIndex * sliceSize;
-        var end = Math.min(begin + sliceSize, bytesLength);
-
-        var bytes = new Array(end - begin);
-        for (var offset = begin, i = 0; offset < end; ++i, ++offset) {
-            bytes[i] = byteCharacters[offset].charCodeAt(0);
-        }
-        byteArrays[sliceIndex] = new Uint8Array(bytes);
+function normalizeMimeType(mimeType) {
+    // The editor reports `image/jpg` for jpg files;
+    // canvas.toBlob silently falls back to png for unknown types.
+    if (!mimeType || mimeType === 'image/jpg') {
+        return 'image/jpeg';
     }
-    return new Blob(byteArrays, { type: contentType });
+    return mimeType;
+}
+
+
+function imageToBlob(editedImageObject) {
+    const mimeType = normalizeMimeType(editedImageObject.mimeType);
+
+    // Older editor versions only hand us the data URL.
+    // Let the browser decode it natively instead of looping over the bytes.
+    if (!editedImageObject.imageCanvas) {
+        return fetch(editedImageObject.imageBase64).then(response => response.blob());
+    }
+
+    return new Promise((resolve, reject) => {
+        editedImageObject.imageCanvas.toBlob(blob => {
+            if (blob) {
+                resolve(blob);
+            } else {
+                reject(new Error(`Failed to encode canvas as ${mimeType}`));
+            }
+        }, mimeType, editedImageObject.quality);
+    });
 }
 
 
@@ -31,50 +40,154 @@ async function getBase64(file) {
 }
 
 
-async function makeRequest(url, method, data = null) {
-    const config = {
-        method: method,
-        headers: {
-            'X-CSRFToken': document.querySelector('input[name="csrfmiddlewaretoken"]').value,
-        },
-    };
+function buildUrl(url, params) {
+    try {
+
+        if (url.startsWith('/')) {
+            url = window.location.origin + url;
+        } else if (!url.startsWith('http')) {
+            url = window.location.origin + '/' + url;
+        } 
+
+        url = new URL(url);
+        Object.keys(params).forEach(key => url.searchParams.append(key, params[key]));
+    } catch (error) {
+        console.error(`Failed to append query parameters to URL (${url}): ${error.message}`);
+    }
+    return url;
+}
+
+
+const responseCache = {
+    // Caches GET responses by URL together with their ETag,
+    // so unchanged image data can be revalidated instead of downloaded again.
+    // Falls back to memory if sessionStorage is unavailable or full.
+
+    memory: new Map(),
+
+    get(url) {
+        try {
+            const cached = sessionStorage.getItem(`filerobot:${url}`);
+            if (cached) {
+                return JSON.parse(cached);
+            }
+        } catch (error) {}
+        return this.memory.get(url) || null;
+    },
 
-    if (method === 'POST' || method === 'PUT') {
-        config.body = data;
-    } else if (method === 'GET') {
+    set(url, etag, data) {
+        const entry = { etag: etag, data: data };
         try {
+            sessionStorage.setItem(`filerobot:${url}`, JSON.stringify(entry));
+            return;
+        } catch (error) {}
+        this.memory.set(url, entry);
+    },
+};
 
-            if (url.startsWith('/')) {
-                url = window.location.origin + url;
-            } else if (!url.startsWith('http')) {
-                url = window.location.origin + '/' + url;
-            } 
 
-            url = new URL(url);
-            Object.keys(data).forEach(key => url.searchParams.append(key, data[key]));
-            data = null;
-        } catch (error) {
-            console.error(`Failed to append query parameters to URL (${url}): ${error.message}`);
+async function makeRequest(url, method, data = null) {
+    const headers = {
+        'X-CSRFToken': document.querySelector('input[name="csrfmiddlewaretoken"]').value,
+    };
+
+    let cached = null;
+    if (method === 'GET') {
+        url = buildUrl(url, data).toString();
+        data = null;
+
+        cached = responseCache.get(url);
+        if (cached) {
+            headers['If-None-Match'] = cached.etag;
         }
     }
 
     const response = await fetch(url, {
         method: method,
-        headers: {
-            'X-CSRFToken': document.querySelector('input[name="csrfmiddlewaretoken"]').value,
-        },
+        headers: headers,
         body: data,
     });
 
-    let responseData = response.json();
+    if (cached && response.status === 304) {
+        return cached.data;
+    }
+
+    let responseData = await response.json();
     if (!response.ok || !response.status === 200) {
         throw new Error(responseData);
     }
 
+    const etag = response.headers.get('ETag');
+    if (method === 'GET' && etag) {
+        responseCache.set(url, etag, responseData);
+    }
+
     return responseData;
 }
 
 
+class ImageDataLoader {
+    // Coalesces the image data requests of all widgets on a page.
+    // Requests made in the same tick are sent as a single batch request.
+
+    static loaders = {};
+
+    static forUrl(url) {
+        if (!ImageDataLoader.loaders[url]) {
+            ImageDataLoader.loaders[url] = new ImageDataLoader(url);
+        }
+        return ImageDataLoader.loaders[url];
+    }
+
+    constructor(url, maxBatchSize = 100) {
+        this.url = url;
+        this.maxBatchSize = maxBatchSize;
+        this.pending = new Map();
+        this.scheduled = false;
+    }
+
+    load(imageId) {
+        imageId = String(imageId);
+        if (!this.pending.has(imageId)) {
+            let deferred = {};
+            deferred.promise = new Promise((resolve, reject) => {
+                deferred.resolve = resolve;
+                deferred.reject = reject;
+            });
+            this.pending.set(imageId, deferred);
+        }
+
+        if (!this.scheduled) {
+            this.scheduled = true;
+            setTimeout(() => this.flush(), 0);
+        }
+
+        return this.pending.get(imageId).promise;
+    }
+
+    flush() {
+        const pending = this.pending;
+        this.pending = new Map();
+        this.scheduled = false;
+
+        const ids = Array.from(pending.keys());
+        for (let i = 0; i < ids.length; i += this.maxBatchSize) {
+            const batch = ids.slice(i, i + this.maxBatchSize);
+            const url = buildUrl(this.url, {});
+            batch.forEach(id => url.searchParams.append('image_id', id));
+
+            makeRequest(url.toString(), 'GET', {}).then(data => {
+                batch.forEach(id => pending.get(id).resolve(
+                    (data.images && data.images[id]) || { success: false, editable: false },
+                ));
+            }).catch(error => {
+                batch.forEach(id => pending.get(id).reject(error));
+            });
+        }
+    }
+}
+
+
 function parseJsonScript(querySelector) {
     const script = document.querySelector(querySelector);
     if (script) {
@@ -87,6 +200,31 @@ function parseJsonScript(querySelector) {
     return null;
 }
 
+// Widgets with the same options share one config script per page, parsed once.
+const _configs = new Map();
+
+function getConfig(hash) {
+    if (!hash) {
+        return {};
+    }
+    if (!_configs.has(hash)) {
+        // From the page's media, or written next to a widget inserted without it.
+        const config = parseJsonScript(`#filerobot-config-${hash}, script[data-filerobot-config="${hash}"]`);
+        if (config === null) {
+            // Not cached; a widget inserted later may bring it along.
+            console.warn(`Filerobot widget config ${hash} not found on the page; the editor falls back to its defaults.`);
+            return {};
+        }
+        _configs.set(hash, config);
+    }
+    return _configs.get(hash);
+}
+
+function configValue(config, key) {
+    // Every widget gets its own copy; the editor may change it.
+    return key in config ? structuredClone(config[key]) : null;
+}
+
 function _set_if_not_null(obj, key, value) {
     if (value !== null) {
         obj[key] = value;
@@ -95,10 +233,16 @@ function _set_if_not_null(obj, key, value) {
 
 
 class FilerobotWidget {
-    constructor(querySelector, submitUrl, simpleConfig) {
+    constructor(querySelector, submitUrl, simpleConfig, uploadConfig = null, batchUrl = null, configHash = null) {
         // URL to fetch and send data from/to.
         this.submitUrl = submitUrl;
 
+        // Image data is fetched through a loader shared by all widgets on the page.
+        this.loader = batchUrl ? ImageDataLoader.forUrl(batchUrl) : null;
+
+        // Chunked upload settings, only used if the server enabled them.
+        this.uploadConfig = uploadConfig;
+
         // Initialize elements
         this.fileInputWrapper = document.querySelector(`#${querySelector}-filerobot-widget-wrapper`);
         this.fileInputWidget = this.fileInputWrapper.querySelector(`#${querySelector}-chooser`);
@@ -106,27 +250,28 @@ class FilerobotWidget {
         let hasChanged = false;
         this.isShowingEditor = false;
 
+        const config = getConfig(configHash);
         const bigCfg = {
-            translations:         parseJsonScript('#filerobot-translations'),
-
-            tabsIds:              parseJsonScript(`#${querySelector}-tabs`),
-            theme:                parseJsonScript(`#${querySelector}-theme`),
-            annotationsCommon:    parseJsonScript(`#${querySelector}-annotationsCommon`),
-            Text:                 parseJsonScript(`#${querySelector}-Text`),
-            Image:                parseJsonScript(`#${querySelector}-Image`),
-            Rect:                 parseJsonScript(`#${querySelector}-Rect`),
-            Ellipse:              parseJsonScript(`#${querySelector}-Ellipse`),
-            Polygon:              parseJsonScript(`#${querySelector}-Polygon`),
-            Pen:                  parseJsonScript(`#${querySelector}-Pen`),
-            Line:                 parseJsonScript(`#${querySelector}-Line`),
-            Arrow:                parseJsonScript(`#${querySelector}-Arrow`),
-            Watermark:            parseJsonScript(`#${querySelector}-Watermark`),
-            Rotate:               parseJsonScript(`#${querySelector}-Rotate`),
-            Crop:                 parseJsonScript(`#${querySelector}-Crop`),
-            CropPresetFolder:     parseJsonScript(`#${querySelector}-CropPresetFolder`),
-            CropPresetGroup:      parseJsonScript(`#${querySelector}-CropPresetGroup`),
-            CropPresetItem:       parseJsonScript(`#${querySelector}-CropPresetItem`),
-            cloudimage:           parseJsonScript(`#${querySelector}-cloudimage`),
+            translations:         window.filerobotTranslations || null,
+
+            tabsIds:              configValue(config, 'tabs'),
+            theme:                configValue(config, 'theme'),
+            annotationsCommon:    configValue(config, 'annotationsCommon'),
+            Text:                 configValue(config, 'Text'),
+            Image:                configValue(config, 'Image'),
+            Rect:                 configValue(config, 'Rect'),
+            Ellipse:              configValue(config, 'Ellipse'),
+            Polygon:              configValue(config, 'Polygon'),
+            Pen:                  configValue(config, 'Pen'),
+            Line:                 configValue(config, 'Line'),
+            Arrow:                configValue(config, 'Arrow'),
+            Watermark:            configValue(config, 'Watermark'),
+            Rotate:               configValue(config, 'Rotate'),
+            Crop:                 configValue(config, 'Crop'),
+            CropPresetFolder:     configValue(config, 'CropPresetFolder'),
+            CropPresetGroup:      configValue(config, 'CropPresetGroup'),
+            CropPresetItem:       configValue(config, 'CropPresetItem'),
+            cloudimage:           configValue(config, 'cloudimage'),
         };
 
         const { TABS, TOOLS } = FilerobotImageEditor;
@@ -239,6 +384,11 @@ class FilerobotWidget {
             return;
         }
         // Parse the design state and set it to the editor config if available.
+        // Delta-encoded states are rebuilt on the server and arrive as objects.
+        if (typeof designState !== 'string') {
+            this.editorConfig.loadableDesignState = designState;
+            return;
+        }
         try {
             this.editorConfig.loadableDesignState = JSON.parse(designState);
         } catch (error) {
@@ -249,7 +399,11 @@ class FilerobotWidget {
     constructImageEditor(sourceImageObj) {
         this.fileInputWidget.style.display = 'none';
         // Refresh the instance; check if we are allowed to edit.
-        return makeRequest(this.submitUrl, 'GET', { image_id: sourceImageObj.id }).then(data => {
+        const request = this.loader
+            ? this.loader.load(sourceImageObj.id)
+            : makeRequest(this.submitUrl, 'GET', { image_id: sourceImageObj.id });
+
+        return request.then(data => {
             if (data.editable) {
                 if (data.design_state) {
                     this._parseDesignState(data.design_state);
@@ -266,22 +420,26 @@ class FilerobotWidget {
 
     onSave(editedImageObject, designState) {
 
-        // Get the base64 data from the image and convert it to a file.
-        const base64Url = editedImageObject.imageBase64;
-        const base64Data = base64Url.split(',')[1];
-        const blob = base64toBlob(base64Data, 'image/jpeg');
-        const file = new File([blob], editedImageObject.fullName, { type: editedImageObject.mimeType });
         const formData = new FormData();
         
         // Even though we let wagtail handle most of the image uploading logic,
         // we still need to save the user-made changes to the image on the server.
-        formData.append('file', file);
         formData.append('title', editedImageObject.name);
         formData.append('image_id', this.fileInputWidget.widget.input.value);
         formData.append('design_state', JSON.stringify(designState));
 
+        // Encode the canvas straight to a blob; no base64 round-trip.
+        const request = imageToBlob(editedImageObject).then(blob => {
+            const file = new File([blob], editedImageObject.fullName, { type: blob.type });
+
+            if (this.uploadConfig && this.uploadConfig.url && this.uploadConfig.chunkSize > 0) {
+                return this.uploadChunked(file, formData);
+            }
+            return this.uploadBinary(file, formData);
+        });
+
         const p = new Promise((resolve, reject) => {
-            makeRequest(this.submitUrl, 'POST', formData).then(data => {
+            request.then(data => {
                 if (data.success) {
                     // Set the widget's state.
                     // See onChange in constructFileInput for more info.
@@ -320,6 +478,82 @@ class FilerobotWidget {
         return p;
     }
 
+    async uploadBinary(file, formData) {
+        // Post the image as the raw request body, the server streams it to disk.
+        // The design state goes in front of the image in the same body,
+        // `design_state_length` tells the server where it ends.
+        const params = {
+            title: formData.get('title'),
+            image_id: formData.get('image_id'),
+            filename: file.name,
+        };
+
+        let body = file;
+        if (formData.has('design_state')) {
+            const state = new TextEncoder().encode(formData.get('design_state'));
+            params.design_state_length = state.byteLength;
+            body = new Blob([state, file], { type: file.type });
+        }
+
+        return makeRequest(buildUrl(this.submitUrl, params), 'POST', body);
+    }
+
+    async uploadChunked(file, formData) {
+        // Upload the file in chunks of at most `chunkSize` bytes.
+        // A chunk which fails is retried from the offset the server last received,
+        // so a flaky connection does not restart the whole upload.
+        const url = this.uploadConfig.url;
+        const maxRetries = 5;
+
+        let upload = await makeRequest(buildUrl(url, { action: 'init' }), 'POST');
+        const uploadId = upload.upload_id;
+        const chunkSize = Math.min(this.uploadConfig.chunkSize, upload.chunk_size || Infinity);
+
+        let offset = 0;
+        let retries = 0;
+        while (offset < file.size) {
+            const chunk = file.slice(offset, offset + chunkSize);
+            try {
+                upload = await makeRequest(
+                    buildUrl(url, { action: 'chunk', upload_id: uploadId, offset: offset }),
+                    'POST', chunk,
+                );
+            } catch (error) {
+                if (++retries > maxRetries) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 500 * retries));
+                try {
+                    // Ask where to resume from; the chunk may have arrived after all.
+                    upload = await makeRequest(
+                        buildUrl(url, { action: 'status', upload_id: uploadId }), 'POST',
+                    );
+                } catch (statusError) {
+                    // Still offline, retry the same chunk.
+                    continue;
+                }
+            }
+
+            if (upload.reset) {
+                throw new Error(`Upload ${uploadId} was lost on the server`);
+            }
+            if (upload.success && upload.offset > offset) {
+                // Progress was made; only consecutive failures count towards the limit.
+                retries = 0;
+            } else if (++retries > maxRetries) {
+                throw new Error(`Failed to upload chunk at offset ${offset}`);
+            }
+            offset = upload.offset;
+        }
+
+        formData.append('filename', file.name);
+        formData.append('content_type', file.type);
+        return makeRequest(
+            buildUrl(url, { action: 'finalize', upload_id: uploadId }),
+            'POST', formData,
+        );
+    }
+
     showImageEditor(url = null) {
         if (!this.filerobotImageEditor) {
             this.filerobotImageEditor = new FilerobotImageEditor(
@@ -20,6 +20,10 @@ class FilerobotWidgetController extends window.StimulusModule.Controller {
 
         // Custom
         shouldAutoSave: { default: true, type: Boolean },
+        upload: { default: '', type: String },
+        chunkSize: { default: 0, type: Number },
+        batch: { default: '', type: String },
+        config: { default: '', type: String },
     };
 
     connect() {
@@ -52,7 +56,13 @@ class FilerobotWidgetController extends window.StimulusModule.Controller {
                 
                 // Custom
                 shouldAutoSave:                   this.shouldAutoSaveValue,
-            }
+            },
+            {
+                url:                              this.uploadValue,
+                chunkSize:                        this.chunkSizeValue,
+            },
+            this.batchValue || null,
+            this.configValue || null,
         );
     }
 
@@ -0,0 +1,17 @@
+from django.urls import path
+
+from .views import async_file_view, async_batch_view, translations_view
+
+
+app_name = "filerobot"
+
+# Needed when serving the widget under ASGI with `FILEROBOT_ASYNC_VIEWS` enabled,
+# and lets browsers cache the editor's translations (admin responses are never cached).
+# Include these in your root urlconf:
+#
+#   path("filerobot/", include("filerobot.urls")),
+urlpatterns = [
+    path("file/", async_file_view, name="file"),
+    path("batch/", async_batch_view, name="batch"),
+    path("translations/<str:language>/<str:version>.js", translations_view, name="translations"),
+]
@@ -0,0 +1,193 @@
+import time
+import threading
+
+from django.core.cache import cache
+
+
+_MISSING = object()
+
+
+def _initial_version() -> int:
+    # If a counter gets evicted it must not restart at a version processes already saw.
+    return time.time_ns() // 1000
+
+
+class CachedResolver:
+    """
+        Two-tier cache for values which rarely change, f.e. collections.
+
+        Resolved values are kept in-process (the local tier) and in Django's cache (the shared tier).
+        Both tiers are keyed by a version counter stored in Django's cache;
+        `invalidate()` bumps it, which drops the value on every node.
+
+        Processes re-read the version at most every `local_timeout` seconds,
+        in between a lookup does not touch the shared cache at all.
+
+        `resolve` is called with the arguments passed to `get()` on a miss in both tiers;
+        those arguments (f.e. a user ID) are part of the cache key. `None` is never cached.
+
+        With `shared=False` values are only kept in-process; the version still lives in Django's cache.
+    """
+
+    def __init__(self, key: str, resolve, timeout: int = None, local_timeout: float = 5, max_local_size: int = 10_000, shared: bool = True):
+        self.key = key
+        self.resolve = resolve
+        self.timeout = timeout
+        self.local_timeout = local_timeout
+        self.max_local_size = max_local_size
+        self.shared = shared
+
+        self._lock = threading.Lock()
+        self._local = {}
+        self._version = None
+        self._checked_at = 0
+
+    @property
+    def version_key(self) -> str:
+        return f"{self.key}:version"
+
+    def get_version(self) -> int:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.local_timeout:
+            return self._version
+
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, _initial_version(), None)
+            version = cache.get(self.version_key)
+
+        with self._lock:
+            if version != self._version:
+                self._local = {}
+                self._version = version
+            self._checked_at = now
+
+        return version
+
+    def make_key(self, version: int, args: tuple) -> str:
+        return ":".join([self.key, str(version), *map(str, args)])
+
+    def get(self, *args):
+        version = self.get_version()
+
+        value = self._local.get(args, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        key = self.make_key(version, args)
+        value = cache.get(key, _MISSING) if self.shared else _MISSING
+        if value is _MISSING:
+            value = self.resolve(*args)
+            if value is None:
+                return None
+            if self.shared:
+                cache.set(key, value, self.timeout)
+
+        self.set_local(args, value)
+        return value
+
+    def peek(self, *args):
+        """
+            The cached value, without resolving it on a miss.
+        """
+        version = self.get_version()
+        value = self._local.get(args, _MISSING)
+        if value is _MISSING:
+            value = cache.get(self.make_key(version, args)) if self.shared else None
+        return value
+
+    def set(self, *args, value):
+        """
+            Store a value someone resolved (or created) themselves.
+        """
+        version = self.get_version()
+        if self.shared:
+            cache.set(self.make_key(version, args), value, self.timeout)
+        self.set_local(args, value)
+
+    def set_local(self, args: tuple, value):
+        with self._lock:
+            if len(self._local) >= self.max_local_size:
+                self._local = {}
+            self._local[args] = value
+
+    def invalidate(self):
+        """
+            Drop all cached values, in this process and - once they re-check the version - all others.
+        """
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.add(self.version_key, _initial_version(), None)
+
+        with self._lock:
+            self._local = {}
+            self._version = None
+
+
+class Generations:
+    """
+        Generation counters in Django's cache, one per name (f.e. a collection ID).
+
+        Cache keys built from `get_many()` change whenever one of the names is `bump()`ed,
+        so values cached under the old keys are never read again and simply expire.
+
+        With a `local_timeout` counters are also kept in-process and re-read at most
+        every `local_timeout` seconds; other processes see a bump that much later.
+    """
+
+    def __init__(self, key: str, local_timeout: float = 0, max_local_size: int = 10_000):
+        self.key = key
+        self.local_timeout = local_timeout
+        self.max_local_size = max_local_size
+
+        self._lock = threading.Lock()
+        self._local = {}
+
+    def make_key(self, name) -> str:
+        return f"{self.key}:{name}"
+
+    def get_many(self, names) -> dict:
+        generations = {}
+        if self.local_timeout:
+            now = time.monotonic()
+            for name in names:
+                local = self._local.get(name)
+                if local is not None and now - local[1] < self.local_timeout:
+                    generations[name] = local[0]
+
+        keys = {self.make_key(name): name for name in names if name not in generations}
+        if not keys:
+            return generations
+
+        found = cache.get_many(keys)
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            initial = _initial_version()
+            for key in missing:
+                cache.add(key, initial, None)
+            found.update(cache.get_many(missing))
+
+        for key, value in found.items():
+            generations[keys[key]] = value
+
+        if self.local_timeout:
+            with self._lock:
+                if len(self._local) >= self.max_local_size:
+                    self._local = {}
+                for key, value in found.items():
+                    self._local[keys[key]] = (value, now)
+
+        return generations
+
+    def get(self, name) -> int:
+        return self.get_many([name]).get(name)
+
+    def bump(self, *names):
+        for name in names:
+            try:
+                cache.incr(self.make_key(name))
+            except ValueError:
+                cache.add(self.make_key(name), _initial_version(), None)
+            self._local.pop(name, None)
@@ -0,0 +1,237 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from wagtail.models import Collection
+
+from .cache import CachedResolver, Generations
+from .permissions import get_image_permission_policy
+from ..models import UserCollection
+from filerobot import (
+    FILEROBOT_COLLECTION_NAME,
+    FILEROBOT_COLLECTION_CACHE_KEY,
+    FILEROBOT_COLLECTION_CACHE_TIMEOUT,
+    FILEROBOT_ORIGINALS_COLLECTION_NAME,
+    FILEROBOT_ORIGINALS_CACHE_KEY,
+    FILEROBOT_USER_COLLECTIONS,
+    FILEROBOT_USER_COLLECTIONS_CACHE_KEY,
+    FILEROBOT_CHOOSER_COLLECTIONS_CACHE_KEY,
+    FILEROBOT_CHOOSER_CACHE_KEY,
+    FILEROBOT_LOCAL_CACHE_TIMEOUT,
+)
+
+
+# Serializes tree writes made by this process;
+# concurrent writes from other processes are caught by the unique `path`.
+_tree_lock = threading.Lock()
+
+
+def get_or_create_root_collection(name: str, attempts: int = 3) -> Collection:
+    """
+        Get the root collection named `name`, creating it if it does not exist.
+
+        Two requests creating a root at the same time compute the same treebeard path;
+        the loser gets an IntegrityError and picks up the winner's collection instead.
+    """
+    collection = Collection.get_root_nodes().filter(name=name).first()
+    if collection is not None:
+        return collection
+
+    with _tree_lock:
+        for attempt in range(attempts):
+            collection = Collection.get_root_nodes().filter(name=name).first()
+            if collection is not None:
+                return collection
+
+            try:
+                with transaction.atomic():
+                    return Collection.add_root(name=name)
+            except IntegrityError:
+                # Someone else added a root at the same path; it may or may not be ours.
+                if attempt == attempts - 1:
+                    raise
+
+
+def _resolve_filerobot_collection() -> Collection:
+    return Collection.get_root_nodes().filter(
+        name=FILEROBOT_COLLECTION_NAME,
+    ).first()
+
+
+filerobot_collection = CachedResolver(
+    FILEROBOT_COLLECTION_CACHE_KEY,
+    _resolve_filerobot_collection,
+    timeout=FILEROBOT_COLLECTION_CACHE_TIMEOUT,
+    local_timeout=FILEROBOT_LOCAL_CACHE_TIMEOUT,
+)
+
+
+def get_filerobot_collection() -> Collection:
+    """
+        The filerobot root collection, or None if it does not exist (yet).
+        See signals.py for invalidation.
+    """
+    return filerobot_collection.get()
+
+
+originals_collection = CachedResolver(
+    FILEROBOT_ORIGINALS_CACHE_KEY,
+    lambda: get_or_create_root_collection(FILEROBOT_ORIGINALS_COLLECTION_NAME),
+    timeout=FILEROBOT_COLLECTION_CACHE_TIMEOUT,
+    local_timeout=FILEROBOT_LOCAL_CACHE_TIMEOUT,
+)
+
+
+def get_originals_collection() -> Collection:
+    """
+        The root collection images uploaded in the chooser are stored in.
+        It is created on first use.
+    """
+    return originals_collection.get()
+
+
+def get_user_collection_name(user, taken) -> str:
+    """
+        The name of the collection of `user` under the filerobot root;
+        `taken` holds the names of its existing children, which may belong to someone else.
+    """
+    name = user.get_username()
+    if name in taken:
+        return f"{name} ({user.pk})"
+    return name
+
+
+def create_user_collections(user) -> UserCollection:
+    """
+        Create the collections of `user`:
+        `FILEROBOT_COLLECTION_NAME` > `username` > `originals`.
+
+        Only collections recorded in `UserCollection` belong to a user;
+        if the name is already taken by another collection, the user's gets their pk appended.
+
+        The filerobot root row is locked for the duration,
+        so concurrent requests for the same user can not both create them.
+    """
+    root = get_filerobot_collection()
+    if root is None:
+        raise ValueError("No filerobot collection found")
+
+    with _tree_lock, transaction.atomic():
+        # Also gives us a fresh `numchild` for treebeard.
+        root = Collection.objects.select_for_update().get(pk=root.pk)
+
+        existing = UserCollection.objects\
+            .select_related("collection", "originals")\
+            .filter(user_id=user.pk)\
+            .first()
+        if existing is not None:
+            return existing
+
+        taken = set(
+            root.get_children()\
+                .filter(name=user.get_username())\
+                .values_list("name", flat=True)
+        )
+        collection = root.add_child(name=get_user_collection_name(user, taken))
+        originals = collection.add_child(name=FILEROBOT_ORIGINALS_COLLECTION_NAME)
+
+        return UserCollection.objects.create(
+            user=user,
+            collection=collection,
+            originals=originals,
+        )
+
+
+def _resolve_user_collections(user_id) -> tuple[Collection, Collection]:
+    user_collections = UserCollection.objects\
+        .select_related("collection", "originals")\
+        .filter(user_id=user_id)\
+        .first()
+
+    if user_collections is None:
+        user = get_user_model()._default_manager.get(pk=user_id)
+        user_collections = create_user_collections(user)
+
+    return user_collections.collection, user_collections.originals
+
+
+# Maps user IDs to their (collection, originals) collections.
+user_collections = CachedResolver(
+    FILEROBOT_USER_COLLECTIONS_CACHE_KEY,
+    _resolve_user_collections,
+    timeout=FILEROBOT_COLLECTION_CACHE_TIMEOUT,
+    local_timeout=FILEROBOT_LOCAL_CACHE_TIMEOUT,
+)
+
+
+def get_user_collections(user) -> tuple[Collection, Collection]:
+    """
+        The `(collection, originals)` collections of `user`, created on first use.
+    """
+    return user_collections.get(user.pk)
+
+
+def _resolve_chooser_collection_ids(user_id) -> tuple[int]:
+    user = get_user_model()._default_manager.get(pk=user_id)
+
+    if FILEROBOT_USER_COLLECTIONS:
+        own = get_user_collections(user)
+    else:
+        own = (get_filerobot_collection(), get_originals_collection())
+
+    ids = set(
+        get_image_permission_policy().collections_user_has_permission_for(user, "choose")\
+            .values_list("pk", flat=True)
+    )
+    ids.update(collection.pk for collection in own if collection is not None)
+    return tuple(sorted(ids))
+
+
+chooser_collection_ids = CachedResolver(
+    FILEROBOT_CHOOSER_COLLECTIONS_CACHE_KEY,
+    _resolve_chooser_collection_ids,
+    timeout=FILEROBOT_COLLECTION_CACHE_TIMEOUT,
+    local_timeout=FILEROBOT_LOCAL_CACHE_TIMEOUT,
+)
+
+
+def get_chooser_collection_ids(user) -> tuple[int]:
+    """
+        IDs of the collections `user` may choose images from in the filerobot chooser:
+        their own filerobot collections, and every collection they have the `choose` permission for.
+
+        Cached per user; see signals.py for invalidation.
+    """
+    return chooser_collection_ids.get(user.pk)
+
+
+# Bumped whenever an image in the collection changes; see signals.py.
+# ALL_COLLECTIONS changes with every image.
+collection_generations = Generations(f"{FILEROBOT_CHOOSER_CACHE_KEY}:generation")
+ALL_COLLECTIONS = "*"
+
+
+def _is_root(collection: Collection, name: str, resolver: CachedResolver) -> bool:
+    if collection.depth != 1:
+        return False
+
+    if collection.name == name:
+        return True
+
+    # It may have been renamed.
+    current = resolver.peek()
+    return current is not None and current.pk == collection.pk
+
+
+def is_filerobot_collection(collection: Collection) -> bool:
+    """
+        Whether `collection` is (or was, before it got renamed) the filerobot root collection.
+    """
+    return _is_root(collection, FILEROBOT_COLLECTION_NAME, filerobot_collection)
+
+
+def is_originals_collection(collection: Collection) -> bool:
+    """
+        Whether `collection` is (or was, before it got renamed) the originals root collection.
+    """
+    return _is_root(collection, FILEROBOT_ORIGINALS_COLLECTION_NAME, originals_collection)
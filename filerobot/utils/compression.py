@@ -0,0 +1,156 @@
+"""
+    Compressed JSON storage for design states.
+
+    Values are stored as a single tag byte followed by the payload:
+
+    - `j` plain (compact) JSON
+    - `z` zlib compressed JSON
+    - `s` zstd compressed JSON (requires the `zstandard` package)
+
+    The tag is stored per value, so the codec can be changed at any time;
+    existing rows are read with whatever codec they were written with.
+"""
+
+import json
+import zlib
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CODECS = {
+    None: b"j",
+    "zlib": b"z",
+    "zstd": b"s",
+}
+
+
+def _check_codec(codec):
+    if codec not in CODECS:
+        raise ImproperlyConfigured(
+            f"Unknown design state compression {codec!r}, choose one of: {', '.join(map(repr, CODECS))}"
+        )
+    if codec == "zstd" and zstandard is None:
+        raise ImproperlyConfigured(
+            "zstd design state compression requires the `zstandard` package."
+        )
+
+
+def compress_json(value, codec = "zlib") -> bytes:
+    """
+        Serialize `value` to compact JSON and compress it with `codec`.
+    """
+    data = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if codec == "zlib":
+        return CODECS[codec] + zlib.compress(data, 6)
+    if codec == "zstd":
+        return CODECS[codec] + zstandard.ZstdCompressor(level=3).compress(data)
+    return CODECS[None] + data
+
+
+def decompress_json(data: bytes):
+    """
+        Inverse of `compress_json`.
+    """
+    if not data:
+        return None
+
+    tag, data = data[:1], data[1:]
+    if tag == b"z":
+        data = zlib.decompress(data)
+    elif tag == b"s":
+        if zstandard is None:
+            raise ImproperlyConfigured(
+                "Reading zstd compressed design states requires the `zstandard` package."
+            )
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif tag != b"j":
+        raise ValueError(f"Unknown compressed JSON tag {tag!r}")
+
+    return json.loads(data)
+
+
+class CompressedValue:
+    """
+        A value as loaded from the database, decompressed on first access.
+
+        Model instances do this for you; `.values()` querysets return these as-is,
+        use `load()` to get the value.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def load(self):
+        return decompress_json(self.data)
+
+
+class CompressedJSONAttribute(DeferredAttribute):
+    """
+        Decompresses the loaded value when it is first accessed.
+        Rows which are loaded but never read (f.e. for `bulk_update`) are never decompressed.
+    """
+
+    def __get__(self, instance, cls=None):
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedValue):
+            value = value.load()
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedJSONField(models.BinaryField):
+    """
+        Stores JSON serializable values compressed in a binary column.
+
+        Behaves like a `JSONField` when reading and writing the attribute,
+        but the value can not be queried on. JSON encoded strings are parsed before storing,
+        so they are not encoded twice.
+    """
+    descriptor_class = CompressedJSONAttribute
+
+    def __init__(self, *args, codec = "zlib", **kwargs):
+        # The codec only affects new writes and is left out of migrations.
+        _check_codec(codec)
+        self.codec = codec
+        super().__init__(*args, **kwargs)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return CompressedValue(bytes(value))
+
+    def to_python(self, value):
+        if isinstance(value, (CompressedValue, bytes, memoryview)):
+            return value
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except ValueError:
+                pass
+        return value
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+
+        # Untouched values are written back as they were loaded.
+        if isinstance(value, CompressedValue):
+            return value.data
+        if isinstance(value, (bytes, memoryview)):
+            return bytes(value)
+
+        return compress_json(self.to_python(value), self.codec)
+
+    def value_to_string(self, obj):
+        return json.dumps(self.value_from_object(obj))
@@ -0,0 +1,66 @@
+import hashlib
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.safestring import mark_safe
+
+from .cache import CachedResolver, Generations
+from filerobot import (
+    FILEROBOT_FRAGMENT_CACHE,
+    FILEROBOT_FRAGMENT_CACHE_KEY,
+    FILEROBOT_FRAGMENT_CACHE_TIMEOUT,
+    FILEROBOT_LOCAL_CACHE_TIMEOUT,
+)
+
+
+if FILEROBOT_FRAGMENT_CACHE not in (None, False, "local", "shared"):
+    raise ImproperlyConfigured(
+        f"Unknown FILEROBOT_FRAGMENT_CACHE {FILEROBOT_FRAGMENT_CACHE!r}, choose one of: None, 'local', 'shared'"
+    )
+
+
+fragment_cache = CachedResolver(
+    FILEROBOT_FRAGMENT_CACHE_KEY,
+    # Fragments are only ever stored with `set()`.
+    None,
+    timeout=FILEROBOT_FRAGMENT_CACHE_TIMEOUT,
+    local_timeout=FILEROBOT_LOCAL_CACHE_TIMEOUT,
+    shared=FILEROBOT_FRAGMENT_CACHE == "shared",
+)
+
+# One per image pk, bumped when the image or one of its renditions changes; see signals.py.
+fragment_generations = Generations(
+    f"{FILEROBOT_FRAGMENT_CACHE_KEY}:generation",
+    local_timeout=FILEROBOT_LOCAL_CACHE_TIMEOUT,
+)
+
+
+def get_fragment_key(value, template: str, context = None) -> tuple | None:
+    """
+        The fragment cache key of `value` rendered with `template`,
+        or None if it should not be cached.
+
+        Only `filter_spec` is taken from the parent context;
+        templates must not depend on anything else in it.
+    """
+    if not FILEROBOT_FRAGMENT_CACHE or not value:
+        return None
+
+    filter_spec = context.get("filter_spec") if context is not None else None
+    # Filter specs and template names may contain characters memcached does not allow.
+    digest = hashlib.md5(f"{filter_spec}:{template}".encode(), usedforsecurity=False).hexdigest()
+    return (value.pk, fragment_generations.get(value.pk), value.file_hash, digest)
+
+
+def render_fragment(key: tuple | None, render) -> str:
+    """
+        The HTML cached under `key`; calls `render()` and stores the result on a miss.
+    """
+    if key is None:
+        return render()
+
+    html = fragment_cache.peek(*key)
+    if html is None:
+        html = str(render())
+        fragment_cache.set(*key, value=html)
+
+    return mark_safe(html)
@@ -0,0 +1,88 @@
+"""
+    Minimal JSON patch (RFC 6902) support for design states.
+
+    Only the `add`, `remove` and `replace` operations are generated and applied;
+    that is all that is needed to store a design state as the difference to a previous one.
+"""
+
+import copy
+
+
+def _escape(key) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(key: str) -> str:
+    return key.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(src, dst, path: str = "") -> list:
+    """
+        Create a list of operations which turn `src` into `dst`.
+    """
+    if type(src) is not type(dst):
+        return [{"op": "replace", "path": path, "value": dst}]
+
+    if isinstance(src, dict):
+        patch = []
+        for key in src:
+            if key not in dst:
+                patch.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in dst.items():
+            if key not in src:
+                patch.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": value})
+            else:
+                patch.extend(make_patch(src[key], value, f"{path}/{_escape(key)}"))
+        return patch
+
+    if isinstance(src, list):
+        patch = []
+        common = min(len(src), len(dst))
+        for i in range(common):
+            patch.extend(make_patch(src[i], dst[i], f"{path}/{i}"))
+        # Remove from the back so the indices stay valid.
+        for i in range(len(src) - 1, common - 1, -1):
+            patch.append({"op": "remove", "path": f"{path}/{i}"})
+        for i in range(common, len(dst)):
+            patch.append({"op": "add", "path": f"{path}/{i}", "value": dst[i]})
+        return patch
+
+    if src != dst:
+        return [{"op": "replace", "path": path, "value": dst}]
+
+    return []
+
+
+def apply_patch(doc, patch: list):
+    """
+        Apply the operations created by `make_patch` to a copy of `doc`.
+    """
+    doc = copy.deepcopy(doc)
+    for operation in patch:
+        op, path = operation["op"], operation["path"]
+        value = copy.deepcopy(operation.get("value"))
+
+        if path == "":
+            doc = value
+            continue
+
+        *parents, key = [_unescape(part) for part in path.split("/")[1:]]
+        target = doc
+        for part in parents:
+            target = target[int(part)] if isinstance(target, list) else target[part]
+
+        if isinstance(target, list):
+            key = int(key)
+            if op == "add":
+                target.insert(key, value)
+            elif op == "remove":
+                del target[key]
+            else:
+                target[key] = value
+        else:
+            if op == "remove":
+                del target[key]
+            else:
+                target[key] = value
+
+    return doc
@@ -0,0 +1,215 @@
+import json
+import base64
+from datetime import datetime
+
+from django.core.paginator import InvalidPage, Page
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext as _
+from wagtail.admin.paginator import WagtailPaginator
+
+
+# Below this many rows the planner's estimate is replaced by an exact count.
+EXACT_COUNT_THRESHOLD = 1000
+
+# Exact counts stop at this many rows; more are shown as "More than ...".
+COUNT_LIMIT = 10_000
+
+
+def estimate_count(queryset):
+    """
+        The number of rows the database expects `queryset` to return, without counting them.
+        Only PostgreSQL is supported; returns None on other databases.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    try:
+        plan = json.loads(queryset.order_by().explain(format="json"))
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+class KeysetPage(Page):
+    """
+        A page of a `KeysetPaginator`.
+
+        `next_page_number()` and `previous_page_number()` return cursors rather than numbers,
+        so Wagtail's pagination templates link to them through the `p` parameter as usual.
+    """
+
+    def __init__(self, object_list, number, paginator, has_next, has_previous):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        if not self._has_next:
+            raise InvalidPage(_("That page contains no results"))
+        return self.paginator.encode_cursor(self.number + 1, self.object_list[-1], forward=True)
+
+    def previous_page_number(self):
+        if not self._has_previous:
+            raise InvalidPage(_("That page number is less than 1"))
+        if self.number == 2:
+            return 1
+        return self.paginator.encode_cursor(self.number - 1, self.object_list[0], forward=False)
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1 if self.object_list else 0
+
+
+class KeysetPaginator(WagtailPaginator):
+    """
+        Paginates a queryset on `(created_at, pk)`, newest first.
+
+        Pages are fetched with `WHERE (created_at, pk) < (...)` from the previous page
+        instead of an OFFSET, so every page costs the same however deep it is.
+        Plain page numbers still work (with an OFFSET), f.e. for links from elsewhere.
+
+        The total is taken from the last page when we are on it. Otherwise, with `estimate=True`,
+        it is the planner's estimate; else rows are counted up to `COUNT_LIMIT`.
+    """
+
+    def __init__(self, object_list, per_page, estimate = False, **kwargs):
+        object_list = object_list.order_by("-created_at", "-pk")
+        super().__init__(object_list, per_page, **kwargs)
+        self.estimate = estimate
+        self.estimated = False
+        self.limited = False
+        # The page last returned by `page()`.
+        self.current_page = None
+
+    @cached_property
+    def count(self):
+        page = self.current_page
+        if page is not None and not page.has_next():
+            return (page.number - 1) * self.per_page + len(page.object_list)
+
+        if self.estimate:
+            count = estimate_count(self.object_list)
+            if count is not None and count >= EXACT_COUNT_THRESHOLD:
+                self.estimated = True
+                return count
+
+        count = self.object_list[:COUNT_LIMIT + 1].count()
+        if count > COUNT_LIMIT:
+            self.limited = True
+            return COUNT_LIMIT
+        return count
+
+    @cached_property
+    def num_pages(self):
+        num_pages = super().num_pages
+        page = self.current_page
+        if page is not None:
+            # Estimates and limited counts may fall short of where the cursors got us.
+            num_pages = max(num_pages, page.number + page.has_next())
+        return num_pages
+
+    @cached_property
+    def items_count_label(self):
+        count = self.count
+        if self.estimated:
+            label = _("About %(count)s %(items)s")
+        elif self.limited:
+            label = _("More than %(count)s %(items)s")
+        else:
+            return super().items_count_label
+        return label % {
+            "count": f"{count:,}",
+            "items": self.verbose_name_plural,
+        }
+
+    def get_elided_page_range(self, page_number):
+        """
+            The first page and the pages around the current one, by number;
+            the last page is only known from a count.
+            Numbers are fetched with an OFFSET, previous and next use cursors.
+        """
+        page = self.current_page
+        if page is None:
+            return []
+
+        numbers = [1]
+        if page.number > 3:
+            numbers.append(self.ELLIPSIS)
+        numbers += range(max(2, page.number - 1), page.number + 1)
+        if page.has_next():
+            numbers.append(page.number + 1)
+        return numbers
+
+    def encode_cursor(self, number: int, obj, forward: bool) -> str:
+        data = [number, int(forward), obj.created_at.isoformat(), obj.pk]
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str):
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            number, forward, created_at, pk = json.loads(data)
+            return int(number), bool(forward), datetime.fromisoformat(created_at), pk
+        except (ValueError, TypeError):
+            raise InvalidPage(_("That page number is not an integer"))
+
+    def page(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            pass
+        else:
+            return self.offset_page(number)
+
+        number, forward, created_at, pk = self.decode_cursor(str(number))
+        if number < 2:
+            raise InvalidPage(_("That page number is less than 1"))
+
+        if forward:
+            after = Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            objects = list(self.object_list.filter(after)[:self.per_page + 1])
+            has_next = len(objects) > self.per_page
+            objects = objects[:self.per_page]
+            has_previous = True
+        else:
+            before = Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+            objects = list(
+                self.object_list.filter(before).reverse()[:self.per_page + 1]
+            )
+            has_previous = len(objects) > self.per_page
+            objects = objects[:self.per_page][::-1]
+            has_next = True
+
+        if not objects:
+            raise InvalidPage(_("That page contains no results"))
+
+        self.current_page = KeysetPage(objects, number, self, has_next=has_next, has_previous=has_previous)
+        return self.current_page
+
+    def offset_page(self, number: int):
+        if number < 1:
+            raise InvalidPage(_("That page number is less than 1"))
+
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not objects and number > 1:
+            raise InvalidPage(_("That page contains no results"))
+
+        self.current_page = KeysetPage(
+            objects[:self.per_page], number, self,
+            has_next=len(objects) > self.per_page,
+            has_previous=number > 1,
+        )
+        return self.current_page
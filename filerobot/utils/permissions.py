@@ -0,0 +1,15 @@
+from wagtail.images import get_image_model
+
+
+def get_image_permission_policy():
+    """
+        Wagtail's permission policy for the image model.
+        Looked up on use; importing it at module level requires the app registry to be ready.
+    """
+    try:
+        from wagtail.permissions import policy_registry
+    except ImportError: # Older Wagtail versions
+        from wagtail.images.permissions import permission_policy
+        return permission_policy
+
+    return policy_registry.get_by_type(get_image_model())
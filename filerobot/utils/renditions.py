@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from wagtail.images.models import Filter
+
+from filerobot import (
+    FILEROBOT_RENDITION_WORKERS,
+)
+
+
+def _generate(job):
+    image, filter = job
+    return image.generate_rendition_file(filter)
+
+
+def ensure_renditions(images, spec: str, workers: int = FILEROBOT_RENDITION_WORKERS) -> int:
+    """
+        Make sure every image in `images` has a rendition for `spec`,
+        f.e. the thumbnails on a chooser results page.
+
+        Renditions should have been fetched with `prefetch_renditions(spec)`, so finding the
+        existing ones does not query. Missing files are generated in a pool of `workers` threads,
+        and all rows are inserted with a single query from the calling thread,
+        so the pool never touches the database.
+        Files of rows which lose a conflict with a concurrent request are deleted again.
+        Returns the number of renditions created.
+    """
+    missing = []
+    for image in images:
+        Rendition = image.get_rendition_model()
+        filter = image.clean_filter_for_svg(Filter(spec=spec))
+        try:
+            image.find_existing_rendition(filter)
+        except Rendition.DoesNotExist:
+            missing.append((image, filter))
+
+    if not missing:
+        return 0
+
+    if workers > 1 and len(missing) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(missing))) as executor:
+            files = list(executor.map(_generate, missing))
+    else:
+        files = [_generate(job) for job in missing]
+
+    Rendition = missing[0][0].get_rendition_model()
+    renditions = [
+        Rendition(
+            image=image,
+            filter_spec=filter.spec,
+            focal_point_key=filter.get_cache_key(image),
+            file=file,
+        )
+        for (image, filter), file in zip(missing, files)
+    ]
+    Rendition.objects.bulk_create(
+        renditions,
+        # Someone may have created some of them in the meantime; theirs are used.
+        ignore_conflicts=True,
+    )
+
+    # Not every database returns the pks from bulk_create.
+    created = {
+        (rendition.image_id, rendition.filter_spec, rendition.focal_point_key): rendition
+        for rendition in Rendition.objects.filter(
+            image__in=[image for image, filter in missing],
+            filter_spec__in={filter.spec for image, filter in missing},
+        )
+    }
+    for (image, filter), ours in zip(missing, renditions):
+        focal_point_key = filter.get_cache_key(image)
+        rendition = created.get((image.pk, filter.spec, focal_point_key))
+        if rendition is None or rendition.file.name != ours.file.name:
+            # Our row lost the conflict, the file bulk_create saved for it is not used by anything.
+            ours.file.delete(save=False)
+        if rendition is None:
+            continue
+
+        rendition.image = image
+        image._add_to_prefetched_renditions(rendition)
+        Rendition.cache_backend.set(
+            Rendition.construct_cache_key(image, focal_point_key, filter.spec),
+            rendition,
+        )
+
+    return len(missing)
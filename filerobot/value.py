@@ -1,7 +1,11 @@
+import functools
+from contextvars import ContextVar
 from typing import Self, TYPE_CHECKING
 from django.template.loader import render_to_string as _render_to_string
 from django.utils.safestring import mark_safe as _mark_safe
+from wagtail.blocks import Block
 from wagtail.images import get_image_model
+from .utils.fragments import get_fragment_key, render_fragment
 
 if TYPE_CHECKING:
     from wagtail.images.models import (
@@ -20,6 +24,7 @@ class BlockTemplateMixin:
         
         `{% include_block ... %}`
     """
+    __slots__ = ()
 
     def get_context(self, parent_context=None):
         return {
@@ -47,6 +52,75 @@ class BlockTemplateMixin:
         return _mark_safe(_render_to_string(template, new_context))
 
 
+class ImageIdentityMap:
+    """
+        The images loaded by pk during one request, one instance per pk.
+
+        Values built from a pk only register it here; the first value which needs
+        its image loads every pending pk with a single query.
+        Rendition specs passed along are prefetched in the same go.
+    """
+    __slots__ = ("images", "pending", "renditions")
+
+    def __init__(self):
+        self.images = {}
+        self.pending = set()
+        self.renditions = set()
+
+    @classmethod
+    def current(cls) -> "Self | None":
+        return _identity_map.get()
+
+    @classmethod
+    def activate(cls) -> "Self":
+        """
+            Start a new identity map for the current request (or context).
+            See signals.py, it is activated on `request_started`.
+        """
+        identity_map = cls()
+        _identity_map.set(identity_map)
+        return identity_map
+
+    @classmethod
+    def deactivate(cls):
+        _identity_map.set(None)
+
+    def add(self, pk, renditions = ()):
+        if pk not in self.images:
+            self.pending.add(pk)
+            self.renditions.update(renditions)
+
+    def add_image(self, image: "WagtailImage"):
+        # An image someone loaded already; no need to fetch it again.
+        self.images.setdefault(image.pk, image)
+        self.pending.discard(image.pk)
+
+    def get(self, pk) -> "WagtailImage | None":
+        if pk not in self.images:
+            self.pending.add(pk)
+            self.load()
+        return self.images.get(pk)
+
+    def load(self):
+        pending, renditions = self.pending, self.renditions
+        self.pending, self.renditions = set(), set()
+
+        queryset = Image.objects.all()
+        if renditions:
+            queryset = queryset.prefetch_renditions(*renditions)
+
+        images = queryset.in_bulk(pending)
+        for pk in pending:
+            # Deleted images are remembered as well, so they are not queried again.
+            self.images[pk] = images.get(pk)
+
+
+_identity_map: ContextVar[ImageIdentityMap | None] = ContextVar("filerobot_identity_map", default=None)
+
+# Marks a value whose image has not been loaded yet.
+_UNLOADED = object()
+
+
 class FilerobotImageValue(BlockTemplateMixin):
     """
         Image value used to represent the underlying image instance
@@ -54,31 +128,70 @@ class FilerobotImageValue(BlockTemplateMixin):
         This is used to make any return value from the widget
         behave like a wagtail block which can be rendered with
         `{% include_block ... %}`
+
+        It can be built from a pk alone, the image is then loaded on first use;
+        see ImageIdentityMap. A deleted image makes the value falsy.
     """
-    __noproxy_fields__ = [
-        "initializer",
-        "image",
-        "template_name",
-        "get_context",
-        "get_template",
-        "render_as_block",
-    ]
+    __slots__ = ("initializer", "_pk", "_image", "_identity_map")
 
     template_name = "filerobot/blocks/filerobot.html"
 
-    def __init__(self, initializer, image: "WagtailImage"):
+    def __init__(self, initializer, image: "WagtailImage" = None, pk = None, identity_map: ImageIdentityMap = None, renditions = ()):
         # Initializer is the calling instance of this class.
         # It can be a django model, a wagtail block, a formfield, etc.
-        self.initializer = initializer
+        object.__setattr__(self, "initializer", initializer)
 
-        # The underlying image instance to use.
-        self.image = image
+        if image is not None:
+            if not isinstance(image, Image):
+                raise ValueError("image must be an instance of Image")
+            pk = image.pk
+        elif pk is None:
+            raise ValueError("either image or pk is required")
+
+        if identity_map is None:
+            identity_map = ImageIdentityMap.current()
+
+        if identity_map is not None:
+            if image is None:
+                identity_map.add(pk, renditions)
+            else:
+                identity_map.add_image(image)
+
+        object.__setattr__(self, "_pk", pk)
+        object.__setattr__(self, "_image", _UNLOADED if image is None else image)
+        # Only needed to load the image; do not keep the whole map alive otherwise.
+        object.__setattr__(self, "_identity_map", identity_map if image is None else None)
+
+    @property
+    def image(self) -> "WagtailImage | None":
+        """
+            The underlying image instance; None if it was deleted.
+        """
+        image = self._image
+        if image is _UNLOADED:
+            if self._identity_map is not None:
+                image = self._identity_map.get(self._pk)
+            else:
+                image = Image.objects.filter(pk=self._pk).first()
+            object.__setattr__(self, "_image", image)
+        return image
+
+    @image.setter
+    def image(self, image: "WagtailImage"):
+        object.__setattr__(self, "_image", image)
+        object.__setattr__(self, "_pk", None if image is None else image.pk)
+
+    @property
+    def pk(self):
+        # Known without loading the image.
+        return self._pk
+
+    id = pk
 
-        if not isinstance(image, Image):
-            raise ValueError("image must be an instance of Image")
-    
     def __repr__(self):
-        return f"{self.__class__.__name__}({self.image.title})"
+        if self._image is _UNLOADED:
+            return f"{self.__class__.__name__}(pk={self._pk!r})"
+        return f"{self.__class__.__name__}({getattr(self.image, 'title', None)})"
             
     def __str__(self):
         return str(self.image)
@@ -87,24 +200,43 @@ class FilerobotImageValue(BlockTemplateMixin):
         return bool(self.image)
     
     def __int__(self):
-        return int(self.image.pk)
+        return int(self._pk)
+
+    def __reduce__(self):
+        """
+            Pickle (f.e. into a cache) the image if it was loaded, else only the pk;
+            the marker for an unloaded image and the identity map do not survive it.
+        """
+        # Wagtail's blocks can not be pickled; their values come back without an initializer.
+        initializer = None if isinstance(self.initializer, Block) else self.initializer
+        if self._image is _UNLOADED:
+            return (self.__class__.from_pk, (initializer, self._pk))
+        return (_restore_value, (self.__class__, initializer, self._pk, self._image))
+
+    def render_as_block(self, context=None):
+        """
+            Render the value, from the fragment cache if FILEROBOT_FRAGMENT_CACHE is enabled.
+        """
+        key = get_fragment_key(self, self.get_template(context=context), context)
+        return render_fragment(key, functools.partial(super().render_as_block, context))
     
     def __getattr__(self, name):
         """
-            Proxy all attribute access to the image object,
-            except for the ones required by the block.
+            Proxy attribute access to the image object.
+            Only called for names which are not defined on the value itself.
         """
-        if name in self.__noproxy_fields__:
-            return object.__getattribute__(self, name)
-        
+        if name.startswith("__") or name in _OWN_ATTRIBUTES:
+            # F.e. copy looking for `__setstate__`, or an unset slot.
+            raise AttributeError(name)
+
         return getattr(self.image, name)
     
     def __setattr__(self, name, value):
         """
-            Proxy all attribute setting to the image object,
-            except for the ones required by the block.
+            Proxy attribute setting to the image object,
+            except for the ones of the value itself.
         """
-        if name in self.__noproxy_fields__:
+        if name in _OWN_ATTRIBUTES:
             object.__setattr__(self, name, value)
         else:
             setattr(self.image, name, value)
@@ -125,6 +257,22 @@ class FilerobotImageValue(BlockTemplateMixin):
             return image
         
         return cls(initializer, image)
+
+    @classmethod
+    def from_pk(cls, initializer, pk, identity_map: ImageIdentityMap = None, renditions = ()) -> "Self":
+        """
+            Utility method to build a FilerobotImageValue which loads its image on first use.
+            Generally used in `to_python` and `bulk_to_python` of blocks.
+        """
+        if pk is None:
+            return None
+
+        if isinstance(pk, (cls, Image)):
+            return cls.from_image(initializer, pk)
+
+        # Stored values may be strings; the identity map is keyed by the actual pk.
+        pk = Image._meta.pk.to_python(pk)
+        return cls(initializer, pk=pk, identity_map=identity_map, renditions=renditions)
     
 
     @classmethod
@@ -137,7 +285,19 @@ class FilerobotImageValue(BlockTemplateMixin):
             return None
         
         if isinstance(value, cls):
-            return value.image.pk
+            return value.pk
         
         return value
 
+
+_OWN_ATTRIBUTES = frozenset({"image", *FilerobotImageValue.__slots__})
+
+
+def _restore_value(cls, initializer, pk, image):
+    # The image may be None (deleted), which the constructor does not take.
+    value = object.__new__(cls)
+    object.__setattr__(value, "initializer", initializer)
+    object.__setattr__(value, "_pk", pk)
+    object.__setattr__(value, "_image", image)
+    object.__setattr__(value, "_identity_map", None)
+    return value
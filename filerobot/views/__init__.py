@@ -1,3 +1,14 @@
 from .widget import (
     file_view,
-)
\ No newline at end of file
+    batch_view,
+)
+from .async_widget import (
+    async_file_view,
+    async_batch_view,
+)
+from .upload import (
+    upload_view,
+)
+from .translations import (
+    translations_view,
+)
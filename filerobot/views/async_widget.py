@@ -0,0 +1,204 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.utils.cache import add_never_cache_headers
+from django.utils.translation import gettext_lazy as _
+
+from ..models import DesignState
+from .widget import (
+    Image,
+    handle_post,
+    is_editable,
+    get_image_data,
+    get_batch_ids,
+    get_batch_validators,
+    get_batch_data,
+    get_image_validators,
+    get_not_modified_response,
+    add_validators,
+)
+
+from filerobot import (
+    FILEROBOT_DISABLE_HISTORY as DISABLE_HISTORY,
+    FILEROBOT_ASYNC_WORKERS as ASYNC_WORKERS,
+)
+
+
+# Bounded pool for the blocking parts of a save (Pillow validation, storage writes).
+# This keeps concurrent editors from exhausting the default sync thread pool.
+_executor = ThreadPoolExecutor(
+    max_workers=ASYNC_WORKERS,
+    thread_name_prefix="filerobot",
+)
+
+
+def _close_connections_after(func, *args, **kwargs):
+    # Database connections opened by the worker are cleaned up
+    # like they would be at the end of a regular request.
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def _run_in_executor(func, *args, **kwargs):
+    """
+        Run a sync function in the filerobot executor.
+        Through asgiref, so context like the active language is carried over to the worker.
+    """
+    return await sync_to_async(
+        _close_connections_after,
+        thread_sensitive=False,
+        executor=_executor,
+    )(func, *args, **kwargs)
+
+
+async def _get_user(request):
+    if hasattr(request, "auser"):
+        return await request.auser()
+
+    # Django < 5.0; evaluate the lazy user outside of the event loop.
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+async def async_file_view(request):
+    """
+        Native async variant of `views.file_view`, used when running under ASGI.
+
+        Wagtail's admin URL decorators are sync-only, so this view can not live in the chooser viewset.
+        It is served from `filerobot.urls` instead and does its own admin access check.
+
+        GET requests use the async ORM for the `Image` and `DesignState` lookups.
+
+        POST requests are handled by `views.widget.handle_post` in a bounded thread pool,
+        see `FILEROBOT_ASYNC_WORKERS`.
+    """
+    response = await _file_view(request)
+    add_never_cache_headers(response)
+    return response
+
+
+async def _check_admin_access(user):
+    if user.is_anonymous or not await sync_to_async(user.has_perms)(["wagtailadmin.access_admin"]):
+        return JsonResponse({
+            "success": False,
+            "errors": [_("You do not have permission to access the admin.")],
+        }, status=403)
+    return None
+
+
+async def _file_view(request):
+    user = await _get_user(request)
+    response = await _check_admin_access(user)
+    if response is not None:
+        return response
+
+    if request.method == "POST":
+        return await _run_in_executor(handle_post, request)
+
+    # GET only supports fetching of image data.
+    # We must be supplied with the image_id.
+    if "image_id" not in request.GET:
+        return JsonResponse({
+            "success": False,
+            "errors": [_("No image ID specified")]
+        })
+
+    try:
+        image = await Image.objects.aget(
+            pk=request.GET["image_id"],
+        )
+    except (Image.DoesNotExist, ValueError):
+        return JsonResponse({
+            "success": False,
+            "reset": True, # Reset the widget to a clean state.
+            "errors": [_("No image found")],
+        })
+
+    editable = is_editable(image, user)
+
+    state = None
+    if editable and not DISABLE_HISTORY:
+        state = await DesignState.objects\
+            .only("image", "base", "snapshot", "depth", "updated_at")\
+            .alatest_for(image)
+
+    etag, last_modified = get_image_validators(image, editable, state)
+    response = get_not_modified_response(request, etag, last_modified)
+    if response is None:
+        # Deferred fields can not be loaded lazily in an async context.
+        design_state = None
+        if state is not None:
+            state = await DesignState.objects.aget(pk=state.pk)
+            design_state = state.designstate
+            if state.is_delta:
+                design_state = await sync_to_async(state.get_design_state)()
+        response = JsonResponse(get_image_data(image, editable, design_state))
+
+    return add_validators(response, etag, last_modified)
+
+
+async def async_batch_view(request):
+    """
+        Native async variant of `views.batch_view`, served from `filerobot.urls` like `async_file_view`.
+    """
+    if request.method != "GET":
+        response = JsonResponse({
+            "success": False,
+            "errors": [_("Only GET requests are supported")],
+        }, status=405)
+        response["Allow"] = "GET"
+        return response
+
+    response = await _batch_view(request)
+    add_never_cache_headers(response)
+    return response
+
+
+async def _batch_view(request):
+    user = await _get_user(request)
+    response = await _check_admin_access(user)
+    if response is not None:
+        return response
+
+    ids = get_batch_ids(request)
+
+    images = await Image.objects.ain_bulk(ids)
+    editable = {
+        pk for pk, image in images.items()
+        if is_editable(image, user)
+    }
+
+    states = {}
+    if editable and not DISABLE_HISTORY:
+        states = {
+            state.image_id: state
+            async for state in DesignState.objects.filter(
+                current_for__image__in=editable,
+            ).only("image", "base", "snapshot", "depth", "updated_at")
+        }
+
+    etag, last_modified = get_batch_validators(ids, images, editable, states)
+    response = get_not_modified_response(request, etag, last_modified)
+    if response is not None:
+        return add_validators(response, etag, last_modified)
+
+    # Load the deferred design states in one go, then rebuild any deltas.
+    design_states = {}
+    if states:
+        full_states = await DesignState.objects.ain_bulk(
+            [state.pk for state in states.values()],
+        )
+        resolved = await sync_to_async(DesignState.objects.resolve)(full_states.values())
+        design_states = {
+            state.image_id: resolved[state.pk]
+            for state in full_states.values()
+        }
+
+    return add_validators(
+        JsonResponse(get_batch_data(ids, images, editable, design_states)),
+        etag, last_modified,
+    )
@@ -1,5 +1,13 @@
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.db.models import QuerySet
+from django.http import Http404, HttpResponse
 from django.urls import reverse, path
 from django.utils.functional import cached_property
+from django.utils.translation import get_language
+from wagtail import hooks
 from wagtail.models import Collection
 from wagtail.images import get_image_model
 from wagtail.images.views.chooser import (
@@ -10,8 +18,29 @@ from wagtail.images.views.chooser import (
 )
 
 from .utils import get_originals_collection_for_request
+from ..utils.collection import (
+    ALL_COLLECTIONS,
+    collection_generations,
+    get_chooser_collection_ids,
+)
+from ..utils.pagination import KeysetPaginator
+from ..utils.renditions import ensure_renditions
 from .widget import (
     file_view,
+    batch_view,
+)
+from .upload import (
+    upload_view,
+)
+from .translations import (
+    translations_view,
+)
+from filerobot import (
+    FILEROBOT_CHOOSER_KEYSET_PAGINATION,
+    FILEROBOT_CHOOSER_ESTIMATED_COUNT,
+    FILEROBOT_CHOOSER_CACHE,
+    FILEROBOT_CHOOSER_CACHE_KEY,
+    FILEROBOT_CHOOSER_CACHE_TIMEOUT,
 )
 
 
@@ -56,20 +85,69 @@ class FileRobotImageCreateViewMixin:
         return instance
 
 
+# The thumbnail size used by Wagtail's chooser templates.
+THUMBNAIL_SPEC = "max-165x165"
+
+# Stands in for the image pk in the reversed chosen URL;
+# numeric, as the select format URL only takes integers.
+_PK_PLACEHOLDER = 9_876_543_210
+
+
 class FileRobotImageChooseViewMixin(FileRobotImageCreateViewMixin):    
+    @cached_property
+    def collection_ids(self):
+        """
+            The collections the user may choose from, or None for superusers; they may choose from all of them.
+        """
+        user = self.request.user
+        if user.is_active and user.is_superuser:
+            return None
+
+        return get_chooser_collection_ids(user)
+
     @cached_property
     def collections(self):
-        if self.request.user.is_superuser:
+        if self.collection_ids is None:
             return super().collections
-        
-        return Collection.objects.filter(pk__in=[
-            self._collection.pk,
-            self._collection.user_collection.pk,
-        ])
+
+        if len(self.collection_ids) < 2:
+            return None
+
+        return Collection.objects.filter(pk__in=self.collection_ids).order_by("path")
     
     def get_object_list(self):
-        return super().get_object_list().filter(collection__in=self.collections)
-    
+        if self.collection_ids is None:
+            return super().get_object_list()
+
+        # The cached IDs already account for the user's permissions;
+        # a plain IN on the indexed collection_id replaces Wagtail's permission query.
+        return get_image_model().objects\
+            .filter(collection_id__in=self.collection_ids)\
+            .select_related("collection")\
+            .prefetch_renditions(THUMBNAIL_SPEC)
+
+    def get_results_page(self, request):
+        if not FILEROBOT_CHOOSER_KEYSET_PAGINATION:
+            return super().get_results_page(request)
+
+        objects = self.get_object_list()
+        objects = self.apply_object_list_ordering(objects)
+        objects = self.filter_object_list(objects)
+
+        # Search results are ordered by relevance and can not be paginated on a key.
+        if isinstance(objects, QuerySet):
+            self.paginator = KeysetPaginator(
+                objects, per_page=self.per_page,
+                estimate=FILEROBOT_CHOOSER_ESTIMATED_COUNT,
+            )
+        else:
+            self.paginator = self.paginator_class(objects, per_page=self.per_page)
+
+        try:
+            return self.paginator.page(request.GET.get("p", 1))
+        except InvalidPage as e:
+            raise Http404 from e
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         chosen_url_name = (
@@ -78,10 +156,18 @@ class FileRobotImageChooseViewMixin(FileRobotImageCreateViewMixin):
             else "filerobot_chooser:chosen"
         )
 
-        for image in context["results"]:
-            image.chosen_url = self.append_preserved_url_parameters(
-                reverse(chosen_url_name, args=(image.id,))
-            )
+        # Wagtail's chosen URLs point to its own chooser;
+        # reverse ours once and fill in the pk per image.
+        prefix, suffix = self.append_preserved_url_parameters(
+            reverse(chosen_url_name, args=(_PK_PLACEHOLDER,))
+        ).split(str(_PK_PLACEHOLDER), 1)
+
+        images = list(context["results"])
+        for image in images:
+            image.chosen_url = f"{prefix}{image.pk}{suffix}"
+
+        # Generate the missing thumbnails up front instead of one by one while rendering.
+        ensure_renditions(images, THUMBNAIL_SPEC)
 
         context["collections"] = self.collections
         return context
@@ -92,7 +178,60 @@ class FileRobotImageChooseView(FileRobotImageChooseViewMixin, ImageChooseView):
 
 
 class FileRobotImageChooseResultsView(FileRobotImageChooseViewMixin, ImageChooseResultsView):
-    pass
+    def get(self, request):
+        if not FILEROBOT_CHOOSER_CACHE:
+            return super().get(request)
+
+        key = self.get_cache_key()
+        cached = cache.get(key)
+        if cached is not None:
+            content, headers = cached
+            return HttpResponse(content, headers=headers)
+
+        response = super().get(request)
+        response.add_post_render_callback(self.cache_response(key))
+        return response
+
+    def cache_response(self, key: str):
+        """
+            Post render callback storing the page along with the headers the view set,
+            f.e. its content type.
+        """
+        def callback(response):
+            if response.status_code == 200:
+                cache.set(key, (response.content, dict(response.items())), FILEROBOT_CHOOSER_CACHE_TIMEOUT)
+        return callback
+
+    def get_cache_key(self) -> str:
+        """
+            Key of the rendered page, built from what the user may see and the request's parameters.
+            If any `construct_image_chooser_queryset` hooks are registered, pages are cached per user.
+            It includes the generation of every collection shown, so changed images are never served stale.
+        """
+        ids = self.collection_ids
+        collection_id = self.request.GET.get("collection_id")
+        if collection_id and (ids is None or collection_id in map(str, ids)):
+            collections = [collection_id]
+        elif ids is None:
+            collections = [ALL_COLLECTIONS]
+        else:
+            collections = ids
+
+        # Users with the same collections and permissions share their pages.
+        parts = [
+            "all" if ids is None else ids,
+            self.can_create(),
+            get_language(),
+            sorted(collection_generations.get_many(collections).items()),
+            sorted(self.request.GET.lists()),
+        ]
+
+        # Hooks may filter the images by user; then nobody else gets their pages.
+        if hooks.get_hooks(self.construct_queryset_hook_name):
+            parts.append(self.request.user.pk)
+
+        digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+        return f"{FILEROBOT_CHOOSER_CACHE_KEY}:{digest}"
 
 
 class FileRobotImageUploadView(FileRobotImageCreateViewMixin, ImageUploadView):
@@ -110,6 +249,12 @@ class FileRobotImageChooserViewSet(ImageChooserViewSet):
     def get_urlpatterns(self):
         return super().get_urlpatterns() + [
             path("filerobot/", file_view, name="filerobot"),
+            path("filerobot/batch/", batch_view, name="filerobot_batch"),
+            path("filerobot/upload/", upload_view, name="filerobot_upload"),
+            path(
+                "filerobot/translations/<str:language>/<str:version>.js",
+                translations_view, name="filerobot_translations",
+            ),
         ]
 
 
@@ -0,0 +1,67 @@
+import json
+import hashlib
+import functools
+
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect
+from django.urls import reverse, NoReverseMatch, get_script_prefix, get_urlconf
+from django.utils import translation
+from django.views.decorators.http import require_GET
+
+from ..translations import translations
+
+
+@functools.lru_cache(maxsize=32)
+def get_catalog(language: str) -> tuple[str, str]:
+    """
+        The editor's translations for `language` as a script, and the hash of its content.
+        Built once per language and process.
+    """
+    with translation.override(language):
+        data = json.dumps({key: str(value) for key, value in translations.items()}, sort_keys=True)
+
+    data = data.replace("<", "\\u003C")
+    content = f"window.filerobotTranslations = {data};\n"
+    return content, hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+
+
+@functools.lru_cache(maxsize=64)
+def _get_translations_url(language: str, script_prefix: str, urlconf) -> str:
+    # The prefix and urlconf only key the cache; `reverse` reads them itself.
+    content, version = get_catalog(language)
+
+    # Wagtail marks every admin response as uncacheable;
+    # prefer the URL from `filerobot.urls` if it is included.
+    try:
+        return reverse("filerobot:translations", args=(language, version))
+    except NoReverseMatch:
+        return reverse("filerobot_chooser:filerobot_translations", args=(language, version))
+
+
+def get_translations_url(language: str = None) -> str:
+    """
+        The versioned URL of the translations for `language` (default: the active language).
+    """
+    language = language or translation.get_language() or "en"
+    return _get_translations_url(language, get_script_prefix(), get_urlconf())
+
+
+@require_GET
+def translations_view(request, language: str, version: str):
+    """
+        Serve the editor's translations for `language`.
+        The URL changes with the content, so the response can be cached forever.
+    """
+    try:
+        language = translation.get_supported_language_variant(language)
+    except LookupError:
+        raise Http404("Unsupported language")
+
+    content, current = get_catalog(language)
+    if version != current:
+        # A page rendered before a deploy; send it to the current catalog.
+        return redirect(get_translations_url(language))
+
+    response = HttpResponse(content, content_type="text/javascript; charset=utf-8")
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
@@ -0,0 +1,214 @@
+import os
+import re
+import time
+import uuid
+import threading
+import mimetypes
+import contextlib
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+from django.core.files.uploadedfile import UploadedFile
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.http import require_POST
+
+from .utils import stream_request_body
+from .widget import save_image
+
+from filerobot import (
+    FILEROBOT_UPLOAD_CHUNK_SIZE as UPLOAD_CHUNK_SIZE,
+    FILEROBOT_UPLOAD_DIR as UPLOAD_DIR,
+    FILEROBOT_UPLOAD_EXPIRY as UPLOAD_EXPIRY,
+)
+
+
+# Upload ID's are always generated by us; anything else is rejected.
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _get_upload_dir(request) -> str:
+    """
+        Directory holding the partial uploads of the current user.
+        Scoping by user makes sure nobody can append to, or finalize, someone else's upload.
+    """
+    return os.path.join(UPLOAD_DIR, str(request.user.pk))
+
+
+def _get_upload_path(request, upload_id: str) -> str:
+    if not upload_id or not _UPLOAD_ID_RE.match(upload_id):
+        return None
+
+    path = os.path.join(_get_upload_dir(request), f"{upload_id}.part")
+    if not os.path.isfile(path):
+        return None
+
+    return path
+
+
+def _remove_expired_uploads(directory: str):
+    """
+        Remove partial uploads which have not been touched for `FILEROBOT_UPLOAD_EXPIRY` seconds.
+    """
+    expires = time.time() - UPLOAD_EXPIRY
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < expires:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+# Without fcntl, uploads are only serialized within this process.
+_upload_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _locked(path: str, mode: str):
+    """
+        Open the partial upload at `path` with an exclusive lock,
+        so concurrent requests for the same upload can not interleave.
+    """
+    with open(path, mode) as f:
+        if fcntl is None:
+            with _upload_lock:
+                yield f
+            return
+
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _offset_response(upload_id: str, path: str, success: bool = True, **kwargs):
+    return JsonResponse({
+        "success": success,
+        "upload_id": upload_id,
+        "offset": os.path.getsize(path),
+        **kwargs,
+    })
+
+
+def _init_upload(request):
+    directory = _get_upload_dir(request)
+    os.makedirs(directory, exist_ok=True)
+    _remove_expired_uploads(directory)
+
+    upload_id = uuid.uuid4().hex
+    path = os.path.join(directory, f"{upload_id}.part")
+    open(path, "xb").close()
+
+    return _offset_response(
+        upload_id, path,
+        chunk_size=UPLOAD_CHUNK_SIZE,
+    )
+
+
+def _append_chunk(request, upload_id: str, path: str):
+    try:
+        offset = int(request.GET.get("offset", ""))
+    except ValueError:
+        return _offset_response(
+            upload_id, path, success=False,
+            errors=[_("No chunk offset specified")],
+        )
+
+    # The offset is checked and the chunk appended under one lock;
+    # a retried request racing the original one must not append twice.
+    with _locked(path, "r+b") as f:
+        size = os.fstat(f.fileno()).st_size
+
+        # The client is out of sync with us (f.e. a chunk got lost mid-flight).
+        # Tell it where to resume from instead of corrupting the file.
+        if offset != size:
+            return _offset_response(
+                upload_id, path, success=False,
+                errors=[_("Chunk offset does not match the uploaded size")],
+            )
+
+        # Whatever got written before a dropped connection is kept, the client resumes from there.
+        f.seek(offset)
+        written = stream_request_body(request, f, UPLOAD_CHUNK_SIZE)
+        if written < 0:
+            f.truncate(offset)
+
+    if written < 0:
+        return _offset_response(
+            upload_id, path, success=False,
+            errors=[_("Chunk exceeds the maximum chunk size")],
+        )
+
+    return _offset_response(upload_id, path)
+
+
+def _finalize_upload(request, upload_id: str, path: str):
+    name = os.path.basename(request.POST.get("filename", "")) or f"{upload_id}.jpg"
+    content_type = request.POST.get("content_type") or mimetypes.guess_type(name)[0]
+
+    try:
+        # Waits for a chunk which is still being written.
+        with _locked(path, "rb") as f:
+            file = UploadedFile(
+                file=f,
+                name=name,
+                content_type=content_type,
+                size=os.path.getsize(path),
+            )
+            response = save_image(request, {"file": file}, request.POST)
+    finally:
+        os.remove(path)
+
+    return response
+
+
+@require_POST
+def upload_view(request):
+    """
+        Resumable chunked upload view for images edited in the FilerobotWidget.
+
+        The action is passed in the query string:
+
+        - `action=init` starts a new upload and returns its `upload_id` and the maximum `chunk_size`.
+
+        - `action=status&upload_id=...` returns the number of bytes received so far as `offset`.
+
+        - `action=chunk&upload_id=...&offset=...` appends the raw request body to the upload.
+            If `offset` does not match the received size the chunk is refused,
+            the current `offset` is returned so the widget can resume from there.
+
+        - `action=finalize&upload_id=...` validates and saves the image like `file_view` does.
+            `title`, `image_id`, `design_state`, `filename` and `content_type` are posted as form data.
+
+        Partial uploads live in `FILEROBOT_UPLOAD_DIR` and expire after `FILEROBOT_UPLOAD_EXPIRY` seconds.
+    """
+    action = request.GET.get("action")
+    if action == "init":
+        return _init_upload(request)
+
+    upload_id = request.GET.get("upload_id")
+    path = _get_upload_path(request, upload_id)
+    if path is None:
+        return JsonResponse({
+            "success": False,
+            "reset": True, # Start a new upload.
+            "errors": [_("No upload found")],
+        })
+
+    if action == "status":
+        return _offset_response(upload_id, path)
+
+    if action == "chunk":
+        return _append_chunk(request, upload_id, path)
+
+    if action == "finalize":
+        return _finalize_upload(request, upload_id, path)
+
+    return JsonResponse({
+        "success": False,
+        "errors": [_("Invalid upload action")],
+    })
@@ -1,45 +1,26 @@
-from django.core.cache import cache
 from django.http import HttpRequest
 from wagtail.models import Collection
+
+from ..utils.collection import (
+    get_filerobot_collection as _get_filerobot_collection,
+    get_originals_collection as _get_originals_collection,
+    get_user_collections,
+)
 from filerobot import (
-    FILEROBOT_COLLECTION_NAME,
-    FILEROBOT_COLLECTION_CACHE_KEY,
-    FILEROBOT_COLLECTION_CACHE_TIMEOUT,
+    FILEROBOT_USER_COLLECTIONS as USER_COLLECTIONS,
 )
 
 
 def get_filerobot_collection(request: HttpRequest) -> Collection:
     """
-        Retrieve the filerobot collection ID from the cache.
-        This might save a query.
-        See signals.py for reset logic.
+        Retrieve the filerobot collection.
+        It is cached in-process and in Django's cache, so this does not query the database.
+        See utils.collection and signals.py for reset logic.
     """
-    if hasattr(request, "filerobot_collection") and request.filerobot_collection is not None:
+    if getattr(request, "filerobot_collection", None) is not None:
         return request.filerobot_collection
 
-    cached = cache.get(FILEROBOT_COLLECTION_CACHE_KEY)
-    if cached is not None:
-        collection = Collection.objects.get(pk=cached)
-        
-        setattr(
-            request,
-            "filerobot_collection",
-            collection,
-        )
-        
-        return collection
-
-    root = Collection.get_root_nodes().filter(
-        name=FILEROBOT_COLLECTION_NAME,
-    )
-
-    root = root.first()
-    if root is not None:
-        cache.set(
-            FILEROBOT_COLLECTION_CACHE_KEY,
-            root.pk,
-            FILEROBOT_COLLECTION_CACHE_TIMEOUT,
-        )
+    collection = _get_filerobot_collection()
 
     setattr(
         request,
@@ -47,7 +28,7 @@ def get_filerobot_collection(request: HttpRequest) -> Collection:
         collection,
     )
 
-    return root
+    return collection
 
 
 def get_collection_for_request(request: HttpRequest) -> Collection:
@@ -58,7 +39,8 @@ def get_collection_for_request(request: HttpRequest) -> Collection:
 
         If the user is not authenticated, a ValueError will be raised.
 
-        The collection is created under: `FILEROBOT_COLLECTION_NAME` > `%username%`
+        With `FILEROBOT_USER_COLLECTIONS` the collection is created under: `FILEROBOT_COLLECTION_NAME` > `%username%`,
+        otherwise the filerobot collection itself is used.
     """
     if not request.user.is_authenticated:
         raise ValueError("User is not authenticated")
@@ -68,30 +50,14 @@ def get_collection_for_request(request: HttpRequest) -> Collection:
     if collection is None:
         raise ValueError("No filerobot collection found")
     
-    if hasattr(request, "user_collection") and request.user_collection is not None:
+    if getattr(request, "user_collection", None) is not None:
         return request.user_collection
+
+    if USER_COLLECTIONS:
+        collection, _ = get_user_collections(request.user)
     
     request.user_collection = collection
     return collection
-    
-    #user_collection: Collection = collection.get_children().filter(
-    #    name=request.user.username,
-    #).first()
-#
-    #if user_collection is None:
-    #    user_collection = collection.add_child(
-    #        name=request.user.username,
-    #    )
-#
-    #user_collection.root_collection = collection
-#
-    #setattr(
-    #    request,
-    #    "user_collection",
-    #    user_collection,
-    #)
-#
-    #return user_collection
 
 
 def get_originals_collection_for_request(request: HttpRequest):
@@ -99,44 +65,44 @@ def get_originals_collection_for_request(request: HttpRequest):
         Get the originals collection for the current user.
 
         If the collection does not exist, it will be created.
+        It is cached like the filerobot collection, see utils.collection.
 
-        If the user is not authenticated, a ValueError will be raised.
-
-        The collection is created under: `FILEROBOT_COLLECTION_NAME` > `%username%` > `originals`
+        With `FILEROBOT_USER_COLLECTIONS` the collection is created under: `FILEROBOT_COLLECTION_NAME` > `%username%` > `originals`,
+        otherwise a single `originals` root collection is used.
     """
 
-    if hasattr(request, "originals_collection") and request.originals_collection is not None:
+    if getattr(request, "originals_collection", None) is not None:
         return request.originals_collection
-    
-    originals = Collection.objects.filter(
-        name="originals",
-    ).first()
 
-    if originals is None:
-        originals = Collection.add_root(
-            name="originals",
-        )
+    if USER_COLLECTIONS and request.user.is_authenticated:
+        _, originals = get_user_collections(request.user)
+    else:
+        originals = _get_originals_collection()
 
     request.originals_collection = originals
 
     return originals
 
-    # collection = get_collection_for_request(request)
-    # originals_collection = collection.get_children().filter(
-    #     name="originals",
-    # ).first()
-# 
-    # if originals_collection is None:
-    #     originals_collection = collection.add_child(
-    #         name="originals",
-    #     )
-# 
-    # originals_collection.user_collection = collection
-# 
-    # setattr(
-    #     request,
-    #     "originals_collection",
-    #     originals_collection,
-    # )
-# 
-    # return originals_collection
+
+def stream_request_body(request: HttpRequest, f, max_size: int, read_size: int = 64 * 1024, hasher = None) -> int:
+    """
+        Copy the raw request body to the file-like object `f`.
+
+        The body is read in blocks of `read_size` bytes, it is never loaded into memory as a whole.
+        If a `hashlib` object is passed as `hasher` it is updated with every block written.
+
+        Returns the number of bytes written, or -1 if the body is larger than `max_size`.
+    """
+    written = 0
+    while True:
+        data = request.read(read_size)
+        if not data:
+            return written
+
+        written += len(data)
+        if written > max_size:
+            return -1
+
+        f.write(data)
+        if hasher is not None:
+            hasher.update(data)
@@ -1,21 +1,375 @@
+import os
+import hashlib
+import mimetypes
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.utils.translation import gettext_lazy as _
 from django.http import JsonResponse
+from django.views.decorators.http import require_GET
 
 from wagtail.images import get_image_model
 from wagtail.images.forms import get_image_form
+from wagtail.utils.file import hash_filelike
 
 from ..models import DesignState
-from .utils import get_collection_for_request
+from .utils import (
+    get_collection_for_request,
+    stream_request_body,
+)
 
 from filerobot import (
     FILEROBOT_USER_MUST_MATCH as USER_MUST_MATCH,
     FILEROBOT_DISABLE_HISTORY as DISABLE_HISTORY,
+    FILEROBOT_DEDUPLICATE_UPLOADS as DEDUPLICATE_UPLOADS,
 )
 
 
 Image = get_image_model()
 ImageForm = get_image_form(Image)
 
+# Maximum amount of images fetched in a single `batch_view` request.
+MAX_BATCH_SIZE = 100
+
+# Raw uploads larger than this are refused before they are fully read.
+MAX_UPLOAD_SIZE = getattr(settings, "WAGTAILIMAGES_MAX_UPLOAD_SIZE", 10 * 1024 * 1024)
+
+# Design states sent in front of a raw upload are read into memory; like any other request data.
+MAX_DESIGN_STATE_SIZE = getattr(settings, "DATA_UPLOAD_MAX_MEMORY_SIZE", 2621440)
+
+
+def _image_response(instance):
+    return JsonResponse({
+        "success": True,
+        "id": instance.pk,
+        "url": instance.file.url,
+        "title": instance.title,
+    })
+
+
+def _update_design_state(image, design_state, base_image_id = None, current: bool = True):
+    try:
+        base_image_id = int(base_image_id) if base_image_id else None
+    except (TypeError, ValueError):
+        base_image_id = None
+
+    DesignState.objects.create_state(
+        image, design_state,
+        base_image=base_image_id,
+        current=current,
+    )
+
+
+def find_duplicate_image(request, collection, file, file_hash: str = None, instance = None):
+    """
+        Find an image with exactly the same contents as `file`.
+
+        Images are matched on wagtail's (indexed) `file_hash` column, a SHA1 of the file.
+        Pass `file_hash` if it was already computed while the upload streamed in.
+
+        If `instance` is given (history disabled) only that image is considered,
+        otherwise images in the filerobot collection are.
+    """
+    if file_hash is None:
+        file_hash = hash_filelike(file)
+
+    if instance is not None:
+        if instance.file_hash == file_hash:
+            return instance
+        return None
+
+    duplicates = Image.objects.filter(
+        collection=collection,
+        file_hash=file_hash,
+    )
+
+    # Never hand out someone else's image if users must match.
+    if USER_MUST_MATCH:
+        duplicates = duplicates.filter(uploaded_by_user=request.user)
+
+    return duplicates.order_by("-pk").first()
+
+
+def save_image(request, files, data, file_hash: str = None):
+    """
+        Validate and save an image uploaded by the FilerobotWidget.
+
+        `files` must contain the image under the `file` key.
+        `data` holds the `title`, `image_id` and `design_state` sent by the widget.
+
+        If `FILEROBOT_DEDUPLICATE_UPLOADS` is set, an upload identical to a stored image
+        reuses that image instead of saving a new file. The posted design state is added
+        to its history (if it is not there already), but does not replace its current one.
+
+        Shared by `file_view` and the chunked upload view;
+        see `views.upload.upload_view` for the latter.
+    """
+    # Get proper collection for user.
+    collection = get_collection_for_request(request)
+
+    # Custom post data.
+    # Images uploaded do not know the collection - the form errors.
+    POST_DATA = {
+        "title": data.get("title", ""),
+        "collection": collection.pk,
+    }
+
+    # Override old instances if history is disabled.
+    # image_id get's passed by the javascript widget
+    # if the instance already exists.
+    instance = None
+    if DISABLE_HISTORY and "image_id" in data:
+        try:
+            instance = Image.objects.get(
+                pk=data["image_id"],
+            )
+        except (Image.DoesNotExist, ValueError):
+            pass
+    
+    # Validate ownership if the USER_MUST_MATCH setting is set.
+    if (
+        USER_MUST_MATCH\
+        and instance\
+        and instance.uploaded_by_user\
+        and instance.uploaded_by_user != request.user
+    ):
+        return JsonResponse({
+            "success": False,
+            "errors": [_("You are not allowed to edit this image")],
+        })
+
+    # Re-saving without changes is common; skip the whole save path.
+    if DEDUPLICATE_UPLOADS and "file" in files:
+        duplicate = find_duplicate_image(
+            request, collection, files["file"],
+            file_hash=file_hash,
+            instance=instance,
+        )
+        if duplicate is not None:
+            # The duplicate may be used by other fields and pages;
+            # what they show when opened in the editor must not change.
+            if not DISABLE_HISTORY and "design_state" in data:
+                _update_design_state(
+                    duplicate, data["design_state"], data.get("image_id"),
+                    current=False,
+                )
+
+            return _image_response(duplicate)
+    
+    # Validate form
+    form = ImageForm(
+        POST_DATA,
+        files,
+        instance=instance,
+    )
+    if not form.is_valid():
+        return JsonResponse({
+            "success": False,
+            "errors": form.errors,
+        })
+    
+    # Get an unsaved instance to possibly edit fields.
+    instance = form.save(commit=False)
+
+    # Set the user if it's not set.
+    if not instance.uploaded_by_user:
+        instance.uploaded_by_user = request.user
+
+    # Update the collection if it's different.
+    if instance.collection != collection:
+        instance.collection = collection
+
+    # Save to db.
+    instance.save()
+
+    # Save a possibly supplied design state.
+    # This is so you can continue editing the image
+    # where you left off.
+    if not DISABLE_HISTORY and "design_state" in data:
+        _update_design_state(instance, data["design_state"], data.get("image_id"))
+
+    return _image_response(instance)
+
+
+def _read_exactly(request, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        block = request.read(size - len(data))
+        if not block:
+            break
+        data += block
+    return data
+
+
+def save_raw_image(request):
+    """
+        Save an image posted as the raw request body.
+
+        The widget sends the canvas blob as-is, with the image's MIME type as `Content-Type`.
+        `title`, `image_id` and `filename` are passed in the query string.
+
+        The design state is sent in front of the image, in the same body;
+        `design_state_length` in the query string is its size in bytes.
+        That way the image is never saved without its state.
+
+        The body is streamed to a temporary file, skipping the multipart parser.
+    """
+    data = request.GET
+    if "design_state_length" in request.GET:
+        try:
+            length = int(request.GET["design_state_length"])
+            if length < 0 or (MAX_DESIGN_STATE_SIZE is not None and length > MAX_DESIGN_STATE_SIZE):
+                raise ValueError(length)
+            design_state = _read_exactly(request, length)
+            if len(design_state) != length:
+                raise ValueError(length)
+            design_state = design_state.decode("utf-8")
+        except ValueError:
+            # UnicodeDecodeError is a ValueError as well.
+            return JsonResponse({
+                "success": False,
+                "errors": [_("Invalid design state")],
+            })
+
+        data = request.GET.dict()
+        data["design_state"] = design_state
+
+    name = os.path.basename(data.get("filename", ""))
+    content_type = request.content_type
+    if not name:
+        extension = None
+        if content_type.startswith("image/"):
+            extension = mimetypes.guess_extension(content_type)
+        name = f"image{extension or '.jpg'}"
+
+    # Hash while streaming so deduplication does not need to read the file again.
+    hasher = hashlib.sha1() if DEDUPLICATE_UPLOADS else None
+
+    with TemporaryUploadedFile(name, content_type, 0, None) as file:
+        file.size = stream_request_body(
+            request, file, MAX_UPLOAD_SIZE or float("inf"),
+            hasher=hasher,
+        )
+        if file.size < 0:
+            return JsonResponse({
+                "success": False,
+                "errors": {"file": [_("The uploaded image is too large")]},
+            })
+
+        file.seek(0)
+        return save_image(
+            request, {"file": file}, data,
+            file_hash=hasher.hexdigest() if hasher else None,
+        )
+
+
+def handle_post(request):
+    """
+        Save an upload posted to `file_view`, dispatching on the content type.
+    """
+    content_type = request.content_type or ""
+    if content_type == "application/octet-stream" or content_type.startswith("image/"):
+        return save_raw_image(request)
+
+    return save_image(request, request.FILES, request.POST)
+
+
+def is_editable(image, user) -> bool:
+    """
+        If USER_MUST_MATCH is True, the image to edit
+        must be uploaded by the current user.
+        Otherwise a regular image tag will be shown.
+        We will not accept uploads from other users.
+    """
+    return not (
+        USER_MUST_MATCH\
+        and image.uploaded_by_user_id\
+        and image.uploaded_by_user_id != user.pk
+    )
+
+
+def get_image_data(image, editable: bool, design_state = None) -> dict:
+    """
+        The data `file_view` returns for a GET request.
+    """
+    if not editable:
+        return {
+            # More info below for editable instances.
+            "success": False,
+            "id": image.pk,
+            "url": image.file.url,
+            "title": image.title,
+            "editable": False,
+        }
+
+    data = {
+        "success": True,
+
+        # The image id is used to set and save the actual input field value.
+        # This gets set by the widget in JS.
+        "id": image.pk,
+
+        # The widget will fetch the editable image from this url.
+        "url": image.file.url,
+        
+        # This gets used as the default title in the widget.
+        "title": image.title,
+
+        # Indicate the full editor widget can be used.
+        "editable": True,
+    }
+
+    if design_state is not None:
+        data["design_state"] = design_state
+
+    return data
+
+
+def get_image_validators(image, editable: bool, state: DesignState = None):
+    """
+        The ETag and Last-Modified for the data `file_view` returns for an image.
+
+        Only the state's `updated_at` is used; the (possibly large) design state
+        itself does not have to be loaded to check if the client is up to date.
+        Everything else `get_image_data` returns is part of the ETag.
+    """
+    updated_at = state.updated_at if state else None
+    etag = hashlib.sha1("|".join([
+        str(image.pk),
+        image.file_hash or "",
+        image.file.name,
+        image.title,
+        str(editable),
+        str(state.pk) if state else "",
+        updated_at.isoformat() if updated_at else "",
+    ]).encode()).hexdigest()
+
+    last_modified = image.created_at
+    if updated_at and (last_modified is None or updated_at > last_modified):
+        last_modified = updated_at
+
+    return f'"{etag}"', last_modified
+
+
+def get_not_modified_response(request, etag: str, last_modified):
+    """
+        Returns a 304 response if the validators sent by the client match, otherwise None.
+    """
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def add_validators(response, etag: str, last_modified):
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
 
 def file_view(request):
     """
@@ -29,6 +383,13 @@ def file_view(request):
         It is up to the django setting `FILEROBOT_DISABLE_HISTORY` to determine if the image will be overridden or not.
         Very manual form handling is done.
 
+        POST requests can be made in two ways:
+
+        - As multipart form data, with the image under `file`.
+
+        - With the image as the raw request body (`application/octet-stream` or `image/*`),
+            see `save_raw_image`.
+
         This view:
 
         - Saves the images under a collection
@@ -43,81 +404,7 @@ def file_view(request):
     """
 
     if request.method == "POST":
-        # Get proper collection for user.
-        collection = get_collection_for_request(request)
-
-        # Custom post data.
-        # Images uploaded do not know the collection - the form errors.
-        POST_DATA = {
-            "title": request.POST.get("title", ""),
-            "collection": collection.pk,
-        }
-
-        # Override old instances if history is disabled.
-        # image_id get's passed by the javascript widget
-        # if the instance already exists.
-        instance = None
-        if DISABLE_HISTORY and "image_id" in request.POST:
-            try:
-                instance = Image.objects.get(
-                    pk=request.POST["image_id"],
-                )
-            except Image.DoesNotExist:
-                pass
-        
-        # Validate ownership if the USER_MUST_MATCH setting is set.
-        if (
-            USER_MUST_MATCH\
-            and instance\
-            and instance.uploaded_by_user\
-            and instance.uploaded_by_user != request.user
-        ):
-            return JsonResponse({
-                "success": False,
-                "errors": [_("You are not allowed to edit this image")],
-            })
-        
-        # Validate form
-        form = ImageForm(
-            POST_DATA,
-            request.FILES,
-            instance=instance,
-        )
-        if not form.is_valid():
-            return JsonResponse({
-                "success": False,
-                "errors": form.errors,
-            })
-        
-        # Get an unsaved instance to possibly edit fields.
-        instance = form.save(commit=False)
-    
-        # Set the user if it's not set.
-        if not instance.uploaded_by_user:
-            instance.uploaded_by_user = request.user
-
-        # Update the collection if it's different.
-        if instance.collection != collection:
-            instance.collection = collection
-
-        # Save to db.
-        instance.save()
-
-        # Save a possibly supplied design state.
-        # This is so you can continue editing the image
-        # where you left off.
-        if not DISABLE_HISTORY and "design_state" in request.POST:
-            DesignState.objects.update_or_create(
-                image=instance,
-                defaults={"designstate": request.POST["design_state"]},
-            )
-
-        return JsonResponse({
-            "success": True,
-            "id": instance.pk,
-            "url": instance.file.url,
-            "title": instance.title,
-        })
+        return handle_post(request)
         
     # GET only supports fetching of image data.
     # We must be supplied with the image_id.
@@ -131,57 +418,141 @@ def file_view(request):
         image = Image.objects.get(
             pk=request.GET["image_id"],
         )
-    except Image.DoesNotExist:
+    except (Image.DoesNotExist, ValueError):
         return JsonResponse({
             "success": False,
             "reset": True, # Reset the widget to a clean state.
             "errors": [_("No image found")],
         })
 
-    # If USER_MUST_MATCH is True, the image to edit
-    # must be uploaded by the current user.
-    # Otherwise a regular image tag will be shown.
-    # We will not accept uploads from other users.
-    if (
-            USER_MUST_MATCH\
-            and image.uploaded_by_user\
-            and image.uploaded_by_user != request.user
-        ):
-        data = {
-            # More info below for editable instances.
-            "success": False,
-            "id": image.pk,
-            "url": image.file.url,
-            "title": image.title,
-            "editable": False,
-        }
+    editable = is_editable(image, request.user)
 
-    else:
-        data = {
-            "success": True,
+    # If history is enabled, we will fetch the latest design state.
+    # The user can then continue editing the image where they left off.
+    # The design state itself is deferred; it is not needed for a 304.
+    state = None
+    if editable and not DISABLE_HISTORY:
+        state = DesignState.objects\
+            .only("image", "base", "snapshot", "depth", "updated_at")\
+            .latest_for(image)
 
-            # The image id is used to set and save the actual input field value.
-            # This gets set by the widget in JS.
-            "id": image.pk,
+    etag, last_modified = get_image_validators(image, editable, state)
+    response = get_not_modified_response(request, etag, last_modified)
+    if response is None:
+        design_state = state.get_design_state() if state else None
+        response = JsonResponse(get_image_data(image, editable, design_state))
 
-            # The widget will fetch the editable image from this url.
-            "url": image.file.url,
-            
-            # This gets used as the default title in the widget.
-            "title": image.title,
+    return add_validators(response, etag, last_modified)
+
+
+def get_batch_ids(request) -> set:
+    """
+        The image IDs requested from `batch_view`, at most `MAX_BATCH_SIZE`.
+    """
+    ids = set()
+    for image_id in request.GET.getlist("image_id")[:MAX_BATCH_SIZE]:
+        try:
+            ids.add(int(image_id))
+        except ValueError:
+            pass
+    return ids
+
+
+def get_batch_validators(ids: set, images: dict, editable: set, states: dict):
+    """
+        The combined ETag and Last-Modified of the images in a batch.
+    """
+    image_etags = []
+    last_modified = None
+    for pk in sorted(images):
+        image_etag, image_last_modified = get_image_validators(
+            images[pk], pk in editable, states.get(pk),
+        )
+        image_etags.append(image_etag)
+        if image_last_modified and (last_modified is None or image_last_modified > last_modified):
+            last_modified = image_last_modified
 
-            # Indicate the full editor widget can be used.
-            "editable": True,
+    etag = '"%s"' % hashlib.sha1("|".join(
+        [str(pk) for pk in sorted(ids)] + image_etags,
+    ).encode()).hexdigest()
+
+    return etag, last_modified
+
+
+def get_batch_data(ids: set, images: dict, editable: set, design_states: dict) -> dict:
+    """
+        The data `batch_view` returns, keyed by image ID.
+    """
+    data = {}
+    for pk in ids:
+        if pk not in images:
+            data[pk] = {
+                "success": False,
+                "reset": True, # Reset the widget to a clean state.
+                "errors": [_("No image found")],
+            }
+            continue
+
+        data[pk] = get_image_data(
+            images[pk], pk in editable, design_states.get(pk),
+        )
+
+    return {
+        "success": True,
+        "images": data,
+    }
+
+
+@require_GET
+def batch_view(request):
+    """
+        Fetch the data for many images at once, as `file_view` would for each of them.
+
+        Widgets on the same page coalesce their requests into this view;
+        pass every image as a separate `image_id` parameter.
+
+        This runs one `Image` query and one query for the current `DesignState` of every image,
+        no matter how many images are requested.
+        Returns a JsonResponse with the image data keyed by ID under `images`.
+
+        Like `file_view` this answers with a 304 if none of the images changed;
+        the design states are then never loaded.
+    """
+    ids = get_batch_ids(request)
+
+    images = Image.objects.in_bulk(ids)
+    editable = {
+        pk for pk, image in images.items()
+        if is_editable(image, request.user)
+    }
+
+    states = {}
+    if editable and not DISABLE_HISTORY:
+        states = {
+            state.image_id: state
+            for state in DesignState.objects.filter(
+                current_for__image__in=editable,
+            ).only("image", "base", "snapshot", "depth", "updated_at")
+        }
+
+    etag, last_modified = get_batch_validators(ids, images, editable, states)
+    response = get_not_modified_response(request, etag, last_modified)
+    if response is not None:
+        return add_validators(response, etag, last_modified)
+
+    # Load the deferred design states in one go, then rebuild any deltas.
+    design_states = {}
+    if states:
+        full_states = DesignState.objects.in_bulk(
+            [state.pk for state in states.values()],
+        )
+        resolved = DesignState.objects.resolve(full_states.values())
+        design_states = {
+            state.image_id: resolved[state.pk]
+            for state in full_states.values()
         }
 
-        # If history is enabled, we will fetch the latest design state.
-        # The user can then continue editing the image where they left off.
-        if not DISABLE_HISTORY:
-            state = DesignState.objects.filter(image=image)\
-                .order_by("-updated_at")\
-                .first()
-            
-            if state:
-                data["design_state"] = state.designstate
-
-    return JsonResponse(data)
+    return add_validators(
+        JsonResponse(get_batch_data(ids, images, editable, design_states)),
+        etag, last_modified,
+    )
@@ -1,18 +1,29 @@
 from django.forms import widgets
-from django.urls import reverse
+from django.urls import reverse, NoReverseMatch, get_script_prefix, get_urlconf
 from django.utils import translation
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.templatetags.static import static
+from dataclasses import dataclass
+from types import MappingProxyType
+import contextvars
+import functools
+import hashlib
 import json
 
 from wagtail.images import get_image_model
 from wagtail.images.widgets import AdminImageChooser
 
 from . import obj
+from ..value import FilerobotImageValue
 from ..constants import (
     TABS_IDS,
 )
+from filerobot import (
+    FILEROBOT_CHUNKED_UPLOADS as CHUNKED_UPLOADS,
+    FILEROBOT_UPLOAD_CHUNK_SIZE as UPLOAD_CHUNK_SIZE,
+    FILEROBOT_ASYNC_VIEWS as ASYNC_VIEWS,
+)
 
 Image = get_image_model()
 
@@ -96,15 +107,118 @@ _tpl_data = [
 ]
 
 
-def _json_script(data, id: str) -> str:
-    if not data:
-        return ""
-    
-    return format_html(
-        '<script type="application/json" id="{}">{}</script>',
-        id,
-        mark_safe(json.dumps(data, cls=_JSONEncoder)),
-    )
+# Widget attributes which make up the compiled config.
+_config_attributes = frozenset(_vars) | {attribute_name for tpl, attribute_name in _tpl_data}
+
+
+def _get_submit_url() -> str:
+    """
+        The URL the widget fetches and saves images through.
+        Prefers the async view from `filerobot.urls` if enabled and included.
+    """
+    if ASYNC_VIEWS:
+        try:
+            return reverse("filerobot:file")
+        except NoReverseMatch:
+            pass
+
+    return reverse("filerobot_chooser:filerobot")
+
+
+def _get_batch_url() -> str:
+    """
+        The URL widgets fetch the data of their images through, together.
+        Prefers the async view like `_get_submit_url`.
+    """
+    if ASYNC_VIEWS:
+        try:
+            return reverse("filerobot:batch")
+        except NoReverseMatch:
+            pass
+
+    return reverse("filerobot_chooser:filerobot_batch")
+
+
+@functools.lru_cache(maxsize=16)
+def _get_url_attrs(script_prefix: str, urlconf) -> dict:
+    # The arguments only key the cache; `reverse` reads them itself.
+    attrs = {
+        "data-file-robot-widget-submit-value": _get_submit_url(),
+        "data-file-robot-widget-batch-value": _get_batch_url(),
+    }
+
+    # Let the widget upload edited images in chunks.
+    if CHUNKED_UPLOADS:
+        attrs.update({
+            "data-file-robot-widget-upload-value": reverse(
+                "filerobot_chooser:filerobot_upload"
+            ),
+            "data-file-robot-widget-chunk-size-value": UPLOAD_CHUNK_SIZE,
+        })
+
+    return attrs
+
+
+# Like `django.utils.html.json_script`, so the config can not close its script tag.
+_JSON_SCRIPT_ESCAPES = {
+    ord(">"): "\\u003E",
+    ord("<"): "\\u003C",
+    ord("&"): "\\u0026",
+}
+
+
+@dataclass(frozen=True, eq=False)
+class WidgetConfig:
+    """
+        A widget's configuration, serialized once.
+
+        - `data` the object options as a JSON object, keyed like the editor's config
+        - `attrs` the data attributes of the primitive options which are set
+        - `hash` identifies `data`; widgets with the same options share it
+
+        It is part of the widget's media, so Django's media merging
+        emits every distinct config once per page, however many widgets use it.
+    """
+    data: str
+    attrs: MappingProxyType
+    hash: str
+
+    def __eq__(self, other):
+        return isinstance(other, WidgetConfig) and other.hash == self.hash
+
+    def __hash__(self):
+        return hash(self.hash)
+
+    def __html__(self) -> str:
+        return format_html(
+            '<script type="application/json" id="filerobot-config-{}">{}</script>',
+            self.hash,
+            mark_safe(self.data),
+        )
+
+    def inline_html(self) -> str:
+        """
+            The config written next to the widget, for HTML inserted without the page's media.
+        """
+        return format_html(
+            '<script type="application/json" data-filerobot-config="{}">{}</script>',
+            self.hash,
+            mark_safe(self.data),
+        )
+
+
+# Config hashes already written inline during the current request; see signals.py.
+# Outside of a request it is None, and every widget writes its config.
+_inline_configs = contextvars.ContextVar("filerobot_inline_configs", default=None)
+
+
+def activate_inline_configs():
+    _inline_configs.set(set())
+
+
+def deactivate_inline_configs():
+    _inline_configs.set(None)
+
 
 class FilerobotWidget(AdminImageChooser):
     input_type = "hidden"
@@ -204,76 +318,110 @@ class FilerobotWidget(AdminImageChooser):
 
         super().__init__(attrs=attrs)
 
-    def get_context(self, name: str, value, attrs):
-        context = super().get_context(name, value, attrs)
-        attrs = context["attrs"]
-        id_attr = attrs["id"]
-        if id_attr:
-            tpl_data = []
-            for tpl, attribute_name in _tpl_data:
-                tpl_data.append(_json_script(
-                    data=getattr(self, attribute_name),
-                    id=f"{id_attr}-{tpl}",
-                ))
-            context["tpl_data"] = tpl_data
-        return context
+    def __setattr__(self, name, value):
+        # Changing any option drops the compiled config.
+        if name in _config_attributes:
+            self.__dict__.pop("_config", None)
+        super().__setattr__(name, value)
 
-    def build_attrs(self, base_attrs, extra_attrs = None):
+    @property
+    def config(self) -> WidgetConfig:
         """
-            Builds the attributes for the stimulus controller.
+            The compiled configuration; built on first use and shared with copies of this widget
+            (Django copies widgets for every form).
         """
-        attrs = super().build_attrs(base_attrs, extra_attrs)
-        attrs.update({
-            "data-controller": "file-robot-widget",
-            "data-file-robot-widget-submit-value": reverse(
-                "filerobot_chooser:filerobot"
-            ),
-        })
-
-        # Default variables if not specified
-        defaults = {
-            "language": translation.get_language(),
-        }
-
+        config = self.__dict__.get("_config")
+        if config is None:
+            config = self._config = self.compile_config()
+        return config
+
+    def compile_config(self) -> WidgetConfig:
+        data = {}
+        for tpl, attribute_name in _tpl_data:
+            value = getattr(self, attribute_name)
+            if value:
+                data[tpl] = value
+        data = json.dumps(data, cls=_JSONEncoder).translate(_JSON_SCRIPT_ESCAPES)
+
+        attrs = {}
         for var in _vars:
             value = getattr(self, var)
-
-            # Get from defaults
             if value is None:
-                value = defaults.get(var)
+                continue
 
             # Add data attributes for stimulus controller
-            var = var.replace("_", "-")
-            if value is not None:
+            name = "data-file-robot-widget-{}-value".format(var.replace("_", "-"))
+            if isinstance(value, str):
+                attrs[name] = value
+            else:
+                attrs[name] = json.dumps(
+                    obj=value,
+                    cls=_JSONEncoder,
+                )
+
+        return WidgetConfig(
+            data=data,
+            attrs=MappingProxyType(attrs),
+            hash=hashlib.sha256(data.encode("utf-8")).hexdigest()[:16],
+        )
 
-                if isinstance(value, str):
-                    attrs[f"data-file-robot-widget-{var}-value"] = value
-                else:
-                    attrs[f"data-file-robot-widget-{var}-value"] = json.dumps(
-                        obj=value,
-                        cls=_JSONEncoder,
-                    )
+    def build_attrs(self, base_attrs, extra_attrs = None):
+        """
+            Builds the attributes for the stimulus controller.
+        """
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs["data-controller"] = "file-robot-widget"
+        attrs.update(_get_url_attrs(get_script_prefix(), get_urlconf()))
+        attrs.update(self.config.attrs)
+        attrs["data-file-robot-widget-config-value"] = self.config.hash
+
+        # Default variables if not specified
+        language = translation.get_language()
+        if language is not None:
+            attrs.setdefault("data-file-robot-widget-language-value", language)
 
         return attrs
     
+    def get_context(self, name, value_data, attrs):
+        context = super().get_context(name, value_data, attrs)
+
+        # Modals, StreamField children and InlinePanel forms insert widget HTML without its media;
+        # the first widget of every config in a response carries it inline as well.
+        config = self.config
+        written = _inline_configs.get()
+        if written is None or config.hash not in written:
+            context["inline_config"] = config.inline_html()
+            if written is not None:
+                written.add(config.hash)
+
+        return context
+
     def get_value_data(self, value):
-        # value = super().get_value_data(value)
-        # if value is None:
-        #     return None
-        # 
-        # if isinstance(value, Image):
-        #     value = value.pk
+        if isinstance(value, FilerobotImageValue):
+            # Its image is loaded together with the others of the stream;
+            # Wagtail would look it up by pk again.
+            value = value.image
 
         return super().get_value_data(value)
 
-    class Media:
-        css = {
-            "all": (
-                "filerobot/css/filerobot_widget.css",
-            )
-        }
-        js = (
-            "filerobot/js/filerobot.js",
-            "filerobot/js/file_robot_widget_controller.js",
-            "filerobot/js/file_robot_widget.js",
+    @property
+    def media(self):
+        # Imported here; the views import wagtail's admin forms,
+        # which can not be loaded while models (using FilerobotField) are.
+        from ..views.translations import get_translations_url
+
+        return super().media + widgets.Media(
+            css={
+                "all": (
+                    "filerobot/css/filerobot_widget.css",
+                )
+            },
+            js=(
+                # Only pages with a widget load the translations.
+                get_translations_url(),
+                "filerobot/js/filerobot.js",
+                "filerobot/js/file_robot_widget_controller.js",
+                "filerobot/js/file_robot_widget.js",
+                self.config,
+            ),
         )
@@ -0,0 +1,91 @@
+"""
+    Minimal standalone Django setup for the benchmarks in this directory.
+
+    Uses an in-memory SQLite database and runs all migrations.
+"""
+
+import os
+import sys
+import tempfile
+
+import django
+from django.conf import settings
+
+
+def setup(**extra):
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+    settings.configure(
+        DEBUG=False,
+        SECRET_KEY="benchmarks",
+        USE_TZ=True,
+        ALLOWED_HOSTS=["*"],
+        ROOT_URLCONF="wagtail.admin.urls",
+        DEFAULT_AUTO_FIELD="django.db.models.BigAutoField",
+        DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}},
+        MEDIA_ROOT=tempfile.mkdtemp(prefix="filerobot-benchmarks-"),
+        MEDIA_URL="/media/",
+        STATIC_URL="/static/",
+        WAGTAIL_SITE_NAME="benchmarks",
+        INSTALLED_APPS=[
+            "filerobot",
+            "wagtail",
+            "wagtail.sites",
+            "wagtail.users",
+            "wagtail.admin",
+            "wagtail.documents",
+            "wagtail.images",
+            "modelcluster",
+            "taggit",
+            "django.contrib.admin",
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "django.contrib.sessions",
+            "django.contrib.messages",
+            "django.contrib.staticfiles",
+        ],
+        MIDDLEWARE=[
+            "django.contrib.sessions.middleware.SessionMiddleware",
+            "django.contrib.auth.middleware.AuthenticationMiddleware",
+            "django.contrib.messages.middleware.MessageMiddleware",
+        ],
+        TEMPLATES=[{
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "APP_DIRS": True,
+            "OPTIONS": {"context_processors": ["django.template.context_processors.request"]},
+        }],
+        **extra,
+    )
+    django.setup()
+
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+
+
+def make_image(title = "benchmark", size = 8):
+    import io
+    from PIL import Image as PILImage
+    from django.core.files.base import ContentFile
+    from wagtail.images import get_image_model
+
+    f = io.BytesIO()
+    PILImage.new("RGB", (size, size), "red").save(f, "PNG")
+    return get_image_model().objects.create(
+        title=title,
+        file=ContentFile(f.getvalue(), name=f"{title}.png"),
+    )
+
+
+def timeit(func, repeat = 200) -> float:
+    """
+        Median run time of `func` in milliseconds.
+    """
+    import time
+    import statistics
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
@@ -0,0 +1,46 @@
+"""
+    Form construction and validation of a StreamField with many FilerobotBlocks.
+
+    - render: the StreamField form widget, i.e. packing the block definition and every child's form state.
+    - clean: validating the submitted value.
+
+    Run with: python tests/benchmarks/block_forms.py
+"""
+
+from _setup import setup, make_image, timeit
+
+setup()
+
+from wagtail import blocks
+from wagtail.blocks.base import BlockWidget
+
+from filerobot.blocks import FilerobotBlock
+
+
+BLOCKS = [100, 300, 1000]
+
+
+def main():
+    images = [make_image(f"block-{i}") for i in range(10)]
+
+    print(f"{'blocks':>8}{'render ms':>12}{'clean ms':>12}")
+    for count in BLOCKS:
+        stream_block = blocks.StreamBlock([
+            ("image", FilerobotBlock(required=False)),
+        ])
+        value = stream_block.to_python([
+            {"type": "image", "value": images[i % len(images)].pk}
+            for i in range(count)
+        ])
+
+        def render():
+            BlockWidget(stream_block).render_with_errors("body", value)
+
+        def clean():
+            stream_block.clean(value)
+
+        print(f"{count:>8}{timeit(render, repeat=5):>12.2f}{timeit(clean, repeat=5):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
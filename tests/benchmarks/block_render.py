@@ -0,0 +1,61 @@
+"""
+    Front-end rendering of a StreamField with many FilerobotBlocks.
+
+    Loads the stream from its stored JSON, like a page does, and renders every block.
+    The number of queries should not grow with the number of blocks.
+
+    Run with: python tests/benchmarks/block_render.py [local|shared]
+    The optional argument enables FILEROBOT_FRAGMENT_CACHE.
+"""
+
+import sys
+
+from _setup import setup, make_image, timeit
+
+# Without a renditions cache, so every rendition lookup shows up as a query.
+setup(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "renditions": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    },
+    FILEROBOT_FRAGMENT_CACHE=sys.argv[1] if len(sys.argv) > 1 else None,
+)
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from wagtail import blocks
+
+from filerobot.blocks import FilerobotBlock
+
+
+BLOCKS = [10, 100, 300]
+
+
+def main():
+    images = [make_image(f"render-{i}") for i in range(50)]
+
+    stream_block = blocks.StreamBlock([
+        ("image", FilerobotBlock(required=False)),
+    ])
+
+    print(f"{'blocks':>8}{'queries':>10}{'ms':>10}")
+    for count in BLOCKS:
+        raw = [
+            {"type": "image", "value": images[i % len(images)].pk}
+            for i in range(count)
+        ]
+
+        def render():
+            stream_block.render(stream_block.to_python(raw))
+
+        # Creates the renditions.
+        render()
+
+        with CaptureQueriesContext(connection) as queries:
+            render()
+
+        print(f"{count:>8}{len(queries):>10}{timeit(render, repeat=5):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+    Queries and latency per page of chooser results, for Wagtail's image chooser
+    and the filerobot chooser.
+
+    - cold: none of the thumbnails on the page exist yet.
+    - warm: all thumbnails exist.
+
+    Run with: python tests/benchmarks/chooser_results.py
+"""
+
+from _setup import setup, make_image
+
+setup()
+
+import time
+import statistics
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from wagtail.images import get_image_model
+
+
+IMAGES = 40
+REPEAT = 20
+
+Rendition = get_image_model().get_rendition_model()
+
+
+def measure(client, url, cold: bool):
+    timings = []
+    queries = 0
+    for _ in range(REPEAT):
+        if cold:
+            Rendition.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+        queries = len(captured)
+
+    return queries, statistics.median(timings) * 1000
+
+
+def main():
+    for i in range(IMAGES):
+        make_image(f"chooser-{i}", size=800)
+
+    user = get_user_model().objects.create_superuser("admin", "admin@example.com", "admin")
+    client = Client()
+    client.force_login(user)
+
+    print(f"{'chooser':<12}{'state':<8}{'queries':>10}{'ms':>10}")
+    for name, url_name in [
+        ("wagtail", "wagtailimages_chooser:choose_results"),
+        ("filerobot", "filerobot_chooser:choose_results"),
+    ]:
+        url = reverse(url_name)
+        for state, cold in [("cold", True), ("warm", False)]:
+            queries, ms = measure(client, url, cold)
+            print(f"{name:<12}{state:<8}{queries:>10}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
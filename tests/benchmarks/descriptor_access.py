@@ -0,0 +1,64 @@
+"""
+    Attribute access on models with several FilerobotFields, as in a list view.
+
+    Every row's images are loaded with `select_related`; the timings only cover
+    reading `url`-like attributes of every field a few times per row.
+
+    Run with: python tests/benchmarks/descriptor_access.py
+"""
+
+from _setup import setup, make_image, timeit
+
+setup()
+
+from django.db import connection, models
+
+from filerobot.fields import FilerobotField
+
+
+FIELDS = ["hero", "thumbnail", "banner", "logo"]
+ROWS = 500
+
+
+class Article(models.Model):
+    hero = FilerobotField(related_name="+")
+    thumbnail = FilerobotField(related_name="+")
+    banner = FilerobotField(related_name="+")
+    logo = FilerobotField(related_name="+")
+
+    class Meta:
+        app_label = "filerobot"
+
+
+def main():
+    with connection.schema_editor() as schema_editor:
+        schema_editor.create_model(Article)
+
+    images = [make_image(f"article-{i}") for i in range(len(FIELDS))]
+    Article.objects.bulk_create([
+        Article(**dict(zip(FIELDS, images)))
+        for _ in range(ROWS)
+    ])
+    articles = list(Article.objects.select_related(*FIELDS))
+
+    def access():
+        # What a list template does: several attributes of every image.
+        for article in articles:
+            for name in FIELDS:
+                getattr(article, name).title
+                getattr(article, name).width
+                getattr(article, name).height
+
+    def identity():
+        return all(
+            getattr(article, name) is getattr(article, name)
+            for article in articles
+            for name in FIELDS
+        )
+
+    print(f"{'rows':>8}{'fields':>8}{'ms':>10}{'same value':>12}")
+    print(f"{ROWS:>8}{len(FIELDS):>8}{timeit(access, repeat=20):>10.2f}{str(identity()):>12}")
+
+
+if __name__ == "__main__":
+    main()
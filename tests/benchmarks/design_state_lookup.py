@@ -0,0 +1,75 @@
+"""
+    Latency of loading the latest design state of an image,
+    as the number of states per image grows.
+
+    - sort: `filter(image=...).order_by("-updated_at").first()` without the composite index.
+    - index: the same query using the `(image, -updated_at)` index.
+    - current: `DesignState.objects.latest_for(image)`, a lookup through `CurrentDesignState`.
+
+    Run with: python tests/benchmarks/design_state_lookup.py
+"""
+
+from _setup import setup, make_image, timeit
+
+setup()
+
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from filerobot.models import DesignState
+
+
+INDEX = "filerobot_ds_image_updated"
+
+
+def fill(image, count: int):
+    now = timezone.now()
+    DesignState.objects.bulk_create([
+        DesignState(image=image, designstate={"n": i})
+        for i in range(count)
+    ], batch_size=1000)
+
+    # bulk_create sets the same updated_at on every row.
+    states = list(DesignState.objects.filter(image=image).only("pk"))
+    for i, state in enumerate(states):
+        state.updated_at = now - timedelta(seconds=count - i)
+    DesignState.objects.bulk_update(states, ["updated_at"], batch_size=1000)
+
+    DesignState.objects.set_current(image)
+
+
+def sort_lookup(image):
+    return DesignState.objects.filter(image=image).order_by("-updated_at").first()
+
+
+def main():
+    # Other images' states make the table realistic; the index has to filter them out.
+    for i in range(20):
+        fill(make_image(f"other-{i}"), 500)
+
+    print(f"{'states':>8} {'sort (ms)':>10} {'index (ms)':>11} {'current (ms)':>13}")
+    for count in (10, 100, 1000, 10000, 50000):
+        image = make_image(f"image-{count}")
+        fill(image, count)
+
+        expected = DesignState.objects.latest_for(image)
+        assert sort_lookup(image).pk == expected.pk
+
+        indexed = timeit(lambda: sort_lookup(image))
+        current = timeit(lambda: DesignState.objects.latest_for(image))
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX {INDEX}")
+        unindexed = timeit(lambda: sort_lookup(image), repeat=20)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX {INDEX} ON filerobot_designstate (image_id, updated_at DESC)"
+            )
+
+        print(f"{count:>8} {unindexed:>10.3f} {indexed:>11.3f} {current:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+    Storage and read latency of design states, with and without deltas.
+
+    An image is saved `SAVES` times with a large design state (an inline data-URL image,
+    like the editor sends) in which one annotation moves per save.
+
+    - in place: FILEROBOT_DESIGN_STATE_DELTAS off, the image's single state is updated.
+    - deltas, every N: JSON patches with a full snapshot every N states.
+
+    Reported are the bytes stored for the image and the median time to read its latest state.
+
+    Run with: python tests/benchmarks/design_state_storage.py
+"""
+
+from _setup import setup, make_image, timeit
+
+setup()
+
+import base64
+import os
+
+from django.db import connection
+
+import filerobot.models
+from filerobot.models import DesignState
+
+
+SAVES = 60
+
+
+def make_state(i: int) -> dict:
+    return {
+        "imgSrc": "data:image/png;base64," + base64.b64encode(STATIC_BYTES).decode(),
+        "annotations": {
+            f"rect-{n}": {"x": n * 10 + (i if n == i % 20 else 0), "y": n * 5, "width": 50, "height": 20}
+            for n in range(20)
+        },
+        "adjustments": {"crop": {"x": 0, "y": 0, "width": 400 + i, "height": 300}},
+    }
+
+
+# Random bytes do not compress, like the pixels of a real image.
+STATIC_BYTES = os.urandom(110 * 1024)
+
+
+def stored_bytes(image) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COALESCE(SUM(LENGTH(designstate)), 0) FROM filerobot_designstate WHERE image_id = %s",
+            [image.pk],
+        )
+        return cursor.fetchone()[0]
+
+
+def read_latest(image):
+    return DesignState.objects.latest_for(image).get_design_state()
+
+
+def run(label: str, deltas: bool, interval: int = 20):
+    filerobot.models.DESIGN_STATE_DELTAS = deltas
+    filerobot.models.DESIGN_STATE_SNAPSHOT_INTERVAL = interval
+
+    image = make_image(f"storage-{label}")
+    for i in range(SAVES):
+        DesignState.objects.create_state(image, make_state(i))
+
+    assert read_latest(image) == make_state(SAVES - 1)
+
+    rows = DesignState.objects.filter(image=image).count()
+    size = stored_bytes(image) / 1024 / 1024
+    print(f"{label:>18}{rows:>8}{size:>10.2f}{timeit(lambda: read_latest(image), repeat=30):>10.2f}")
+
+
+def main():
+    print(f"{'':>18}{'rows':>8}{'MB':>10}{'read ms':>10}")
+    run("in place", deltas=False)
+    run("deltas, every 5", deltas=True, interval=5)
+    run("deltas, every 20", deltas=True, interval=20)
+
+
+if __name__ == "__main__":
+    main()
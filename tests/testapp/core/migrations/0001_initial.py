@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+import django.db.models.deletion
+import filerobot.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('wagtailimages', '0027_image_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Article',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('image', filerobot.fields.FilerobotField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', widget_kwargs={'annotations_common': None, 'arrow': None, 'avoid_changes_not_saved_alert_on_leave': None, 'cloud_image': None, 'crop': None, 'crop_preset_folder': None, 'crop_preset_group': None, 'crop_preset_item': None, 'default_saved_image_quality': None, 'default_tab_id': None, 'default_tool_id': None, 'disable_save_if_no_changes': None, 'disable_zooming': None, 'ellipse': None, 'force_to_png_in_elliptical_crop': None, 'image': None, 'language': None, 'line': None, 'no_cross_origin': None, 'observe_plugin_container_size': None, 'pen': None, 'polygon': None, 'preview_pixel_ratio': None, 'rect': None, 'rotate': None, 'saving_pixel_ratio': None, 'should_auto_save': True, 'show_canvas_only': None, 'tabs': None, 'text': None, 'typography': None, 'use_backend_translations': None, 'use_cloud_image': None, 'use_zoom_presets_menu': None, 'watermark': None})),
+            ],
+        ),
+    ]
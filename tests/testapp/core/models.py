@@ -0,0 +1,8 @@
+from django.db import models
+
+from filerobot.fields import FilerobotField
+
+
+class Article(models.Model):
+    title = models.CharField(max_length=255, blank=True)
+    image = FilerobotField(null=True, on_delete=models.SET_NULL, related_name="+")
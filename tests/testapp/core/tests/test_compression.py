@@ -0,0 +1,69 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from filerobot.models import DesignState
+from filerobot.utils.compression import (
+    CompressedJSONField,
+    CompressedValue,
+    compress_json,
+    decompress_json,
+)
+
+from .utils import FilerobotTestCase, create_image
+
+
+STATE = {"annotations": {"text-1": {"text": "Grüße"}}, "filters": None, "finetunes": ["Brightness"] * 20}
+
+
+class CompressJSONTestCase(SimpleTestCase):
+    def test_round_trip(self):
+        for codec, tag in [(None, b"j"), ("zlib", b"z")]:
+            with self.subTest(codec=codec):
+                data = compress_json(STATE, codec)
+                self.assertEqual(data[:1], tag)
+                self.assertEqual(decompress_json(data), STATE)
+
+        self.assertLess(len(compress_json(STATE, "zlib")), len(compress_json(STATE, None)))
+
+    def test_empty(self):
+        self.assertIsNone(decompress_json(b""))
+        self.assertIsNone(decompress_json(None))
+
+    def test_unknown_tag(self):
+        with self.assertRaises(ValueError):
+            decompress_json(b"x{}")
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ImproperlyConfigured):
+            CompressedJSONField(codec="lzma")
+
+
+class CompressedJSONFieldTestCase(FilerobotTestCase):
+    def test_round_trip(self):
+        state = DesignState.objects.create(image=create_image(), designstate=STATE)
+        self.assertEqual(DesignState.objects.get(pk=state.pk).designstate, STATE)
+
+    def test_json_string(self):
+        state = DesignState.objects.create(image=create_image(), designstate='{"a": [1, 2]}')
+        self.assertEqual(DesignState.objects.get(pk=state.pk).designstate, {"a": [1, 2]})
+
+    def test_values(self):
+        state = DesignState.objects.create(image=create_image(), designstate=STATE)
+        value = DesignState.objects.filter(pk=state.pk).values_list("designstate", flat=True).get()
+
+        self.assertIsInstance(value, CompressedValue)
+        self.assertEqual(value.data[:1], b"z")
+        self.assertEqual(value.load(), STATE)
+
+    def test_untouched_value_is_kept(self):
+        state = DesignState.objects.create(image=create_image(), designstate=STATE)
+        state = DesignState.objects.get(pk=state.pk)
+        raw = state.__dict__["designstate"]
+
+        # Saving without reading the value writes back the loaded bytes.
+        state.save()
+        self.assertIsInstance(raw, CompressedValue)
+        self.assertEqual(
+            DesignState.objects.filter(pk=state.pk).values_list("designstate", flat=True).get().data,
+            raw.data,
+        )
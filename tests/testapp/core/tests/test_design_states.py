@@ -0,0 +1,148 @@
+from unittest import mock
+
+from filerobot import models
+from filerobot.models import CurrentDesignState, DesignState
+
+from .utils import FilerobotTestCase, create_image
+
+
+def make_state(i: int) -> dict:
+    # Large enough that a delta is smaller than the full state.
+    return {
+        "adjustments": {"crop": {"x": i, "y": 0}},
+        "finetunes": [f"finetune-{n}" for n in range(20)],
+        "annotations": {f"text-{n}": {"text": f"Text {n}"} for n in range(i)},
+    }
+
+
+@mock.patch.object(models, "DESIGN_STATE_DELTAS", True)
+@mock.patch.object(models, "DESIGN_STATE_SNAPSHOT_INTERVAL", 4)
+class DeltaChainTestCase(FilerobotTestCase):
+    def setUp(self):
+        super().setUp()
+        self.image = create_image()
+
+    def create_chain(self, length: int) -> list:
+        return [
+            DesignState.objects.create_state(self.image, make_state(i))
+            for i in range(length)
+        ]
+
+    def assertResolves(self, states: list, expected: list):
+        states = [DesignState.objects.get(pk=state.pk) for state in states]
+        self.assertEqual(
+            [state.get_design_state() for state in states],
+            expected,
+        )
+        resolved = DesignState.objects.resolve(states)
+        self.assertEqual([resolved[state.pk] for state in states], expected)
+
+    def test_chain(self):
+        states = self.create_chain(6)
+
+        # A snapshot every 4 states, deltas in between.
+        self.assertEqual([state.depth for state in states], [0, 1, 2, 3, 0, 1])
+        self.assertEqual(
+            [state.snapshot_id for state in states],
+            [None, states[0].pk, states[0].pk, states[0].pk, None, states[4].pk],
+        )
+        self.assertEqual(states[2].base_id, states[1].pk)
+        self.assertEqual(DesignState.objects.latest_for(self.image), states[-1])
+        self.assertResolves(states, [make_state(i) for i in range(6)])
+
+    def test_delete_snapshot(self):
+        states = self.create_chain(4)
+        states[0].delete()
+
+        self.assertResolves(states[1:], [make_state(i) for i in range(1, 4)])
+        self.assertIsNone(DesignState.objects.get(pk=states[1].pk).snapshot_id)
+        self.assertEqual(DesignState.objects.get(pk=states[3].pk).snapshot_id, states[1].pk)
+
+    def test_delete_delta(self):
+        states = self.create_chain(4)
+        states[1].delete()
+
+        self.assertResolves(
+            [states[0], states[2], states[3]],
+            [make_state(0), make_state(2), make_state(3)],
+        )
+        self.assertIsNone(DesignState.objects.get(pk=states[2].pk).snapshot_id)
+
+    def test_delete_queryset(self):
+        states = self.create_chain(5)
+        DesignState.objects.filter(pk__in=[states[0].pk, states[2].pk]).delete()
+
+        self.assertResolves(
+            [states[1], states[3], states[4]],
+            [make_state(1), make_state(3), make_state(4)],
+        )
+
+    def test_rebase_and_delete(self):
+        states = self.create_chain(6)
+
+        with mock.patch.object(DesignState, "rebase_dependents") as rebase_dependents:
+            rebased, deleted = DesignState.objects.filter(
+                pk__in=[states[0].pk, states[1].pk, states[4].pk],
+            ).rebase_and_delete()
+
+        # The pre_delete signal does not rebase every state again.
+        rebase_dependents.assert_not_called()
+        self.assertEqual((rebased, deleted), (3, 3))
+        self.assertResolves(
+            [states[2], states[3], states[5]],
+            [make_state(2), make_state(3), make_state(5)],
+        )
+
+        # Regular deletes still do.
+        states[2].delete()
+        self.assertResolves([states[3]], [make_state(3)])
+
+    def test_rebase_dependents(self):
+        states = self.create_chain(4)
+
+        self.assertEqual(states[1].rebase_dependents(), 2)
+        rebased = DesignState.objects.filter(pk__in=[states[2].pk, states[3].pk]).order_by("pk")
+        self.assertEqual(
+            [state.snapshot_id for state in rebased],
+            [None, states[2].pk],
+        )
+        # Nothing depends on the last state.
+        self.assertEqual(states[3].rebase_dependents(), 0)
+        self.assertResolves(states, [make_state(i) for i in range(4)])
+
+    def test_delete_current(self):
+        states = self.create_chain(3)
+        with self.captureOnCommitCallbacks(execute=True):
+            states[2].delete()
+
+        self.assertEqual(CurrentDesignState.objects.get(image=self.image).state_id, states[1].pk)
+        self.assertEqual(DesignState.objects.latest_for(self.image).get_design_state(), make_state(1))
+
+    def test_base_image(self):
+        states = self.create_chain(2)
+        copy = create_image("copy")
+        state = DesignState.objects.create_state(copy, make_state(2), base_image=self.image)
+
+        self.assertEqual(state.base_id, states[1].pk)
+        self.assertEqual(state.source_image_id, self.image.pk)
+        self.assertEqual(DesignState.objects.latest_for(copy), state)
+        self.assertResolves([state], [make_state(2)])
+
+
+class DesignStateTestCase(FilerobotTestCase):
+    def test_update_in_place(self):
+        image = create_image()
+        first = DesignState.objects.create_state(image, '{"a": 1}')
+        second = DesignState.objects.create_state(image, {"a": 2})
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(DesignState.objects.get(pk=first.pk).designstate, {"a": 2})
+        self.assertEqual(DesignState.objects.latest_for(image), first)
+
+    def test_not_current(self):
+        image = create_image()
+        current = DesignState.objects.create_state(image, {"a": 1})
+        history = DesignState.objects.create_state(image, {"a": 2}, current=False)
+
+        self.assertNotEqual(current.pk, history.pk)
+        self.assertEqual(DesignState.objects.latest_for(image), current)
@@ -0,0 +1,37 @@
+from django.test import SimpleTestCase
+from wagtail.images import get_image_model
+
+from filerobot.value import FilerobotImageValue
+
+from core.models import Article
+
+
+Image = get_image_model()
+
+
+# Articles and images are never saved; the tests below do not touch the database.
+def make_image(pk: int, title: str):
+    # A collection is passed so the default does not query.
+    return Image(pk=pk, title=title, collection_id=1)
+
+
+class FilerobotFieldTestCase(SimpleTestCase):
+    def test_value_is_cached(self):
+        article = Article(image=make_image(1, "First"))
+
+        value = article.image
+        self.assertIsInstance(value, FilerobotImageValue)
+        self.assertIs(article.image, value)
+        self.assertEqual(article.image.title, "First")
+
+    def test_value_follows_image(self):
+        article = Article(image=make_image(1, "First"))
+        first = article.image
+
+        article.image = make_image(2, "Second")
+        self.assertIsNot(article.image, first)
+        self.assertEqual(article.image.pk, 2)
+        self.assertIs(article.image, article.image)
+
+        article.image = None
+        self.assertIsNone(article.image)
@@ -0,0 +1,52 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from wagtail.test.utils import WagtailTestUtils
+
+from filerobot.views import image_chooser
+
+from .utils import FilerobotTestCase, create_image
+
+
+User = get_user_model()
+
+
+def own_images(images, request):
+    return images.filter(uploaded_by_user=request.user)
+
+
+@mock.patch.object(image_chooser, "FILEROBOT_CHOOSER_CACHE", True)
+class ChooserCacheTestCase(WagtailTestUtils, FilerobotTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("filerobot_chooser:choose_results")
+        self.alice = User.objects.create_superuser("alice", "alice@example.com", "password")
+        self.bob = User.objects.create_superuser("bob", "bob@example.com", "password")
+        create_image("alice-image", uploaded_by_user=self.alice)
+        create_image("bob-image", uploaded_by_user=self.bob)
+
+    def get_results(self, user) -> str:
+        self.client.force_login(user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_shared_pages(self):
+        first = self.get_results(self.alice)
+        self.assertIn("alice-image", first)
+        self.assertIn("bob-image", first)
+
+        with mock.patch.object(image_chooser.ImageChooseResultsView, "get") as get:
+            self.assertEqual(self.get_results(self.bob), first)
+        get.assert_not_called()
+
+    def test_hooks_filtering_by_user(self):
+        with self.register_hook("construct_image_chooser_queryset", own_images):
+            alice = self.get_results(self.alice)
+            bob = self.get_results(self.bob)
+
+        self.assertIn("alice-image", alice)
+        self.assertNotIn("bob-image", alice)
+        self.assertIn("bob-image", bob)
+        self.assertNotIn("alice-image", bob)
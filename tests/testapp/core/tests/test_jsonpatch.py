@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase
+
+from filerobot.utils.jsonpatch import apply_patch, make_patch
+
+
+class JSONPatchTestCase(SimpleTestCase):
+    def assertRoundTrip(self, src, dst):
+        patch = make_patch(src, dst)
+        self.assertEqual(apply_patch(src, patch), dst)
+        return patch
+
+    def test_equal_documents(self):
+        doc = {"adjustments": {"crop": {"x": 0, "y": 0}}, "filters": ["a", "b"]}
+        self.assertEqual(self.assertRoundTrip(doc, doc), [])
+
+    def test_dicts(self):
+        self.assertRoundTrip(
+            {"keep": 1, "change": {"x": 1, "y": 2}, "remove": True},
+            {"keep": 1, "change": {"x": 1, "y": 3, "z": 4}, "add": [1, 2]},
+        )
+
+    def test_lists(self):
+        self.assertRoundTrip([1, 2, 3, 4], [1, 5])
+        self.assertRoundTrip([1], [1, 2, {"a": 3}])
+        self.assertRoundTrip([{"a": 1}, {"b": 2}], [{"a": 2}, {"b": 2, "c": 3}])
+
+    def test_type_changes(self):
+        self.assertRoundTrip({"value": [1, 2]}, {"value": {"0": 1}})
+        self.assertRoundTrip({"value": None}, {"value": 0})
+        self.assertRoundTrip([1, 2], {"a": 1})
+
+    def test_escaped_keys(self):
+        patch = self.assertRoundTrip(
+            {"a/b": 1, "c~d": {"~1": 2}},
+            {"a/b": 2, "c~d": {"~1": 3, "/": 4}},
+        )
+        paths = {operation["path"] for operation in patch}
+        self.assertEqual(paths, {"/a~1b", "/c~0d/~01", "/c~0d/~1"})
+
+    def test_source_is_not_modified(self):
+        src = {"a": [1, {"b": 2}]}
+        dst = {"a": [1, {"b": 3}, 4]}
+        apply_patch(src, make_patch(src, dst))
+        self.assertEqual(src, {"a": [1, {"b": 2}]})
+
+    def test_chain(self):
+        states = [
+            {"annotations": {}, "filters": None},
+            {"annotations": {"text-1": {"text": "Hello"}}, "filters": None},
+            {"annotations": {"text-1": {"text": "Hello world"}}, "filters": "Clarendon"},
+            {"annotations": {}, "filters": "Clarendon", "finetunes": ["Brightness"]},
+        ]
+        doc = states[0]
+        for src, dst in zip(states, states[1:]):
+            doc = apply_patch(doc, make_patch(src, dst))
+            self.assertEqual(doc, dst)
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.paginator import InvalidPage
+from django.utils import timezone
+
+from filerobot.utils import pagination
+from filerobot.utils.pagination import KeysetPaginator
+
+from .utils import FilerobotTestCase, Image, create_image
+
+
+class KeysetPaginatorTestCase(FilerobotTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        for i in range(11):
+            image = create_image(f"image-{i}")
+            # Pairs of images share a timestamp, so the pk has to break ties.
+            Image.objects.filter(pk=image.pk).update(created_at=now - timedelta(minutes=i // 2))
+
+        cls.expected = list(
+            Image.objects.order_by("-created_at", "-pk").values_list("pk", flat=True)
+        )
+
+    def paginator(self):
+        return KeysetPaginator(Image.objects.all(), 3)
+
+    def pks(self, page):
+        return [image.pk for image in page.object_list]
+
+    def test_forward(self):
+        page = self.paginator().page(1)
+        seen = self.pks(page)
+        numbers = [page.number]
+        while page.has_next():
+            page = self.paginator().page(page.next_page_number())
+            seen += self.pks(page)
+            numbers.append(page.number)
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(numbers, [1, 2, 3, 4])
+        self.assertEqual((page.start_index(), page.end_index()), (10, 11))
+
+    def test_backward(self):
+        page = self.paginator().page(4)
+        seen = self.pks(page)
+        while page.has_previous():
+            page = self.paginator().page(page.previous_page_number())
+            seen = self.pks(page) + seen
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(page.number, 1)
+
+    def test_cursor_matches_offset(self):
+        page = self.paginator().page(1)
+        page = self.paginator().page(page.next_page_number())
+        cursor_page = self.paginator().page(page.next_page_number())
+
+        self.assertEqual(self.pks(cursor_page), self.pks(self.paginator().page(3)))
+        self.assertEqual(cursor_page.number, 3)
+
+    def test_count(self):
+        paginator = self.paginator()
+        self.assertEqual(paginator.count, 11)
+        self.assertEqual(paginator.num_pages, 4)
+
+        # On the last page the total is known without counting.
+        paginator = self.paginator()
+        paginator.page(4)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 11)
+
+    def test_count_limit(self):
+        with mock.patch.object(pagination, "COUNT_LIMIT", 5):
+            paginator = self.paginator()
+            self.assertEqual(paginator.count, 5)
+            self.assertTrue(paginator.limited)
+            self.assertIn("More than 5", str(paginator.items_count_label))
+
+            # Cursors go further than the limited count.
+            page = paginator.page(2)
+            self.assertEqual(paginator.num_pages, 3)
+            self.assertTrue(page.has_next())
+
+    def test_elided_page_range(self):
+        paginator = self.paginator()
+        paginator.page(4)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(4)),
+            [1, paginator.ELLIPSIS, 3, 4],
+        )
+
+        paginator = self.paginator()
+        paginator.page(2)
+        self.assertEqual(list(paginator.get_elided_page_range(2)), [1, 2, 3])
+
+    def test_invalid_pages(self):
+        paginator = self.paginator()
+        for number in [0, 5, "not-a-cursor"]:
+            with self.subTest(number=number):
+                with self.assertRaises(InvalidPage):
+                    paginator.page(number)
+
+        self.assertEqual(self.pks(paginator.page(1)), self.expected[:3])
+        self.assertEqual(self.pks(paginator.page("1")), self.expected[:3])
@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from filerobot import FILEROBOT_COLLECTION_NAME, models
+from filerobot.management.commands.filerobot_prune import Command
+from filerobot.models import CurrentDesignState, DesignState
+from filerobot.utils.collection import get_or_create_root_collection
+
+from core.models import Article
+
+from .utils import FilerobotTestCase, Image, create_image
+
+
+def prune(**options) -> str:
+    stdout = StringIO()
+    call_command("filerobot_prune", stdout=stdout, **options)
+    return stdout.getvalue()
+
+
+def age(queryset, days: int, field = "updated_at"):
+    # `auto_now` fields can only be backdated with an update.
+    queryset.update(**{field: timezone.now() - timedelta(days=days)})
+
+
+class PruneDesignStatesTestCase(FilerobotTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(models, "DESIGN_STATE_DELTAS", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.image = create_image()
+        self.states = [
+            DesignState.objects.create_state(self.image, {"step": i, "filters": ["a"] * 20})
+            for i in range(5)
+        ]
+
+    def remaining(self):
+        return list(DesignState.objects.filter(image=self.image).order_by("pk"))
+
+    def test_keep(self):
+        prune(keep=2)
+
+        self.assertEqual(self.remaining(), self.states[3:])
+        self.assertEqual(DesignState.objects.latest_for(self.image), self.states[4])
+        # The kept deltas still resolve after their bases are gone.
+        self.assertEqual(
+            [state.get_design_state()["step"] for state in self.remaining()],
+            [3, 4],
+        )
+
+    def test_older_than(self):
+        age(DesignState.objects.filter(pk__in=[state.pk for state in self.states[:2]]), days=10)
+        prune(keep=1, older_than=5)
+
+        self.assertEqual(self.remaining(), self.states[2:])
+
+    def test_latest_is_kept(self):
+        age(DesignState.objects.all(), days=10)
+        prune(older_than=5)
+
+        self.assertEqual(self.remaining(), self.states[4:])
+        self.assertEqual(self.remaining()[0].get_design_state()["step"], 4)
+
+    def test_current_is_kept(self):
+        # A deduplicated upload adds a newer state to the history, without making it current.
+        DesignState.objects.create_state(self.image, {"step": 5, "filters": ["a"] * 20}, current=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            prune(keep=1)
+        self.assertEqual(self.remaining(), self.states[4:])
+        self.assertEqual(DesignState.objects.latest_for(self.image), self.states[4])
+
+    def test_current_counts_towards_keep(self):
+        history = DesignState.objects.create_state(self.image, {"step": 5, "filters": ["a"] * 20}, current=False)
+
+        prune(keep=2)
+        self.assertEqual(self.remaining(), [self.states[4], history])
+        self.assertEqual(DesignState.objects.latest_for(self.image), self.states[4])
+
+    def test_dry_run(self):
+        output = prune(keep=1, dry_run=True)
+
+        self.assertIn("Would delete 4 design states", output)
+        self.assertEqual(self.remaining(), self.states)
+
+    def test_invalid_options(self):
+        for options in [{}, {"keep": 0}, {"keep": 1, "batch_size": 0}]:
+            with self.subTest(options=options):
+                with self.assertRaises(CommandError):
+                    prune(**options)
+
+
+class PruneImagesTestCase(FilerobotTestCase):
+    def setUp(self):
+        super().setUp()
+        self.collection = get_or_create_root_collection(FILEROBOT_COLLECTION_NAME)
+
+    def create_edit(self, title, source = None, days = 60):
+        image = create_image(title, collection=self.collection)
+        DesignState.objects.create_state(image, {"title": title}, base_image=source)
+        age(Image.objects.filter(pk=image.pk), days=days, field="created_at")
+        return image
+
+    def test_superseded_images(self):
+        first = self.create_edit("first", days=60)
+        second = self.create_edit("second", source=first, days=50)
+        third = self.create_edit("third", source=second, days=40)
+        storage, name = first.file.storage, first.file.name
+
+        # Files are deleted on commit, while the command's executor is still running.
+        command = Command(stdout=StringIO())
+        command.batch_size, command.pause, command.dry_run, command.verbosity = 500, 0, False, 1
+        with ThreadPoolExecutor() as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                command.prune_images(older_than=30, executor=executor)
+
+        self.assertIn("Deleted 2 images", command.stdout.getvalue())
+        self.assertEqual(list(Image.objects.values_list("pk", flat=True)), [third.pk])
+        self.assertFalse(storage.exists(name))
+        self.assertTrue(CurrentDesignState.objects.filter(image=third).exists())
+
+    def test_recent_images_are_kept(self):
+        first = self.create_edit("first", days=10)
+        self.create_edit("second", source=first, days=5)
+
+        prune(images=True)
+        self.assertEqual(Image.objects.count(), 2)
+
+    def test_other_collections_are_kept(self):
+        first = self.create_edit("first")
+        Image.objects.filter(pk=first.pk).update(collection=self.collection.get_first_root_node())
+        self.create_edit("second", source=first, days=50)
+
+        prune(images=True)
+        self.assertEqual(Image.objects.count(), 2)
+
+    def test_referenced_images_are_kept(self):
+        first = self.create_edit("first")
+        self.create_edit("second", source=first, days=50)
+        # Through a FilerobotField without a reverse accessor.
+        Article.objects.create(image=first)
+
+        prune(images=True)
+        self.assertEqual(Image.objects.count(), 2)
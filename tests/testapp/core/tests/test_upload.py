@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from filerobot.models import DesignState
+from filerobot.views import upload
+
+from .utils import FilerobotTestCase, Image, make_png
+
+
+class ChunkedUploadTestCase(FilerobotTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(self.user)
+        self.url = reverse("filerobot_chooser:filerobot_upload")
+
+        upload_dir = tempfile.mkdtemp(prefix="filerobot-uploads-")
+        self.addCleanup(shutil.rmtree, upload_dir, ignore_errors=True)
+        patcher = mock.patch.object(upload, "UPLOAD_DIR", upload_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, action, data = None, **params):
+        query = "&".join(f"{key}={value}" for key, value in {"action": action, **params}.items())
+        if isinstance(data, bytes):
+            return self.client.post(f"{self.url}?{query}", data, content_type="application/octet-stream").json()
+        return self.client.post(f"{self.url}?{query}", data or {}).json()
+
+    def init(self) -> str:
+        response = self.post("init")
+        self.assertTrue(response["success"])
+        self.assertEqual(response["offset"], 0)
+        return response["upload_id"]
+
+    def test_upload(self):
+        data = make_png(size=64)
+        upload_id = self.init()
+
+        middle = len(data) // 2
+        self.assertEqual(self.post("chunk", data[:middle], upload_id=upload_id, offset=0)["offset"], middle)
+        self.assertEqual(self.post("status", upload_id=upload_id)["offset"], middle)
+        self.assertEqual(self.post("chunk", data[middle:], upload_id=upload_id, offset=middle)["offset"], len(data))
+
+        response = self.post("finalize", {
+            "title": "Uploaded",
+            "filename": "uploaded.png",
+            "design_state": '{"a": 1}',
+        }, upload_id=upload_id)
+
+        self.assertTrue(response["success"])
+        image = Image.objects.get(pk=response["id"])
+        self.assertEqual(image.title, "Uploaded")
+        with image.open_file() as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(DesignState.objects.latest_for(image).designstate, {"a": 1})
+
+        # The partial upload is gone.
+        self.assertTrue(self.post("status", upload_id=upload_id)["reset"])
+
+    def test_offset_mismatch(self):
+        upload_id = self.init()
+        self.post("chunk", b"12345", upload_id=upload_id, offset=0)
+
+        # A retried chunk is refused; the client resumes from the returned offset.
+        response = self.post("chunk", b"12345", upload_id=upload_id, offset=0)
+        self.assertFalse(response["success"])
+        self.assertEqual(response["offset"], 5)
+
+        response = self.post("chunk", b"6789", upload_id=upload_id)
+        self.assertFalse(response["success"])
+        self.assertEqual(response["offset"], 5)
+
+    def test_chunk_too_large(self):
+        upload_id = self.init()
+        with mock.patch.object(upload, "UPLOAD_CHUNK_SIZE", 4):
+            response = self.post("chunk", b"12345", upload_id=upload_id, offset=0)
+
+        self.assertFalse(response["success"])
+        self.assertEqual(response["offset"], 0)
+
+    def test_unknown_upload(self):
+        for upload_id in ["0" * 32, "../../etc/passwd", ""]:
+            with self.subTest(upload_id=upload_id):
+                response = self.post("status", upload_id=upload_id)
+                self.assertFalse(response["success"])
+                self.assertTrue(response["reset"])
+
+    def test_other_user(self):
+        upload_id = self.init()
+
+        other = get_user_model().objects.create_superuser("other", "other@example.com", "password")
+        self.client.force_login(other)
+        self.assertTrue(self.post("chunk", b"12345", upload_id=upload_id, offset=0)["reset"])
+
+    def test_expired_uploads(self):
+        upload_id = self.init()
+        path = os.path.join(upload.UPLOAD_DIR, str(self.user.pk), f"{upload_id}.part")
+        os.utime(path, (0, 0))
+
+        self.init()
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,59 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from wagtail.models import Collection
+
+from filerobot.models import UserCollection
+from filerobot.utils.collection import create_user_collections, get_filerobot_collection
+
+from .utils import FilerobotTestCase
+
+
+User = get_user_model()
+
+
+class UserCollectionsTestCase(FilerobotTestCase):
+    def provision(self):
+        call_command("filerobot_user_collections", stdout=StringIO())
+
+    def assertTreeIsValid(self):
+        root = get_filerobot_collection()
+        names = list(root.get_children().values_list("name", flat=True))
+        self.assertEqual(names, sorted(names))
+        self.assertEqual(Collection.find_problems(), ([], [], [], [], []))
+        for user_collection in UserCollection.objects.select_related("user", "collection", "originals"):
+            self.assertEqual(user_collection.originals.get_parent(), user_collection.collection)
+            self.assertEqual(user_collection.collection.get_parent(), root)
+
+    def test_backfill_then_create(self):
+        User.objects.create_user("zed")
+        User.objects.create_user("amy")
+        self.provision()
+        self.assertTreeIsValid()
+
+        # Treebeard inserts sorted by name, after the backfilled collections.
+        bob = create_user_collections(User.objects.create_user("bob"))
+        self.assertEqual(bob.collection.name, "bob")
+        self.assertTreeIsValid()
+
+    def test_backfill_between_existing(self):
+        create_user_collections(User.objects.create_user("bob"))
+        create_user_collections(User.objects.create_user("mia"))
+        for name in ["zed", "amy", "kai", "cat"]:
+            User.objects.create_user(name)
+
+        self.provision()
+        self.assertTreeIsValid()
+        self.assertEqual(UserCollection.objects.count(), 6)
+
+        create_user_collections(User.objects.create_user("eve"))
+        self.assertTreeIsValid()
+
+    def test_taken_names(self):
+        get_filerobot_collection().add_child(name="amy")
+        amy = User.objects.create_user("amy")
+        self.provision()
+
+        self.assertEqual(UserCollection.objects.get(user=amy).collection.name, f"amy ({amy.pk})")
+        self.assertTreeIsValid()
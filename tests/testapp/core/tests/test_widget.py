@@ -0,0 +1,105 @@
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from filerobot import models
+from filerobot.models import DesignState
+from filerobot.views import widget
+
+from .utils import FilerobotTestCase, Image, create_image, make_png
+
+
+class FileViewTestCase(FilerobotTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(self.user)
+        self.url = reverse("filerobot_chooser:filerobot")
+
+    def post_raw(self, data: bytes, design_state = None, **params):
+        body = b""
+        if design_state is not None:
+            state = json.dumps(design_state).encode()
+            params["design_state_length"] = len(state)
+            body = state
+        query = "&".join(f"{key}={value}" for key, value in params.items())
+        return self.client.post(f"{self.url}?{query}", body + data, content_type="image/png").json()
+
+    def test_multipart(self):
+        response = self.client.post(self.url, {
+            "title": "Multipart",
+            "file": create_image("source").file,
+            "design_state": '{"a": 1}',
+        }).json()
+
+        self.assertTrue(response["success"])
+        image = Image.objects.get(pk=response["id"])
+        self.assertEqual(DesignState.objects.latest_for(image).designstate, {"a": 1})
+
+    def test_raw(self):
+        data = make_png(size=16)
+        response = self.post_raw(data, {"a": 1}, title="Raw", filename="raw.png")
+
+        self.assertTrue(response["success"])
+        image = Image.objects.get(pk=response["id"])
+        self.assertEqual(image.title, "Raw")
+        with image.open_file() as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(DesignState.objects.latest_for(image).designstate, {"a": 1})
+
+    def test_invalid_design_state_length(self):
+        response = self.client.post(
+            f"{self.url}?design_state_length=100", b"{}", content_type="image/png",
+        ).json()
+
+        self.assertFalse(response["success"])
+        self.assertFalse(Image.objects.exists())
+
+    def test_design_state_only(self):
+        # Design states are only saved along with their image.
+        image = create_image()
+        response = self.client.post(
+            self.url, {"image_id": image.pk, "design_state": {"a": 1}}, content_type="application/json",
+        ).json()
+
+        self.assertFalse(response["success"])
+        self.assertFalse(DesignState.objects.exists())
+
+
+@mock.patch.object(widget, "DEDUPLICATE_UPLOADS", True)
+class DeduplicateUploadsTestCase(FileViewTestCase):
+    def test_history_does_not_grow(self):
+        data = make_png(size=16)
+        image_id = self.post_raw(data, {"a": 1}, title="Raw")["id"]
+        current = DesignState.objects.latest_for(image_id)
+
+        # Saved again unchanged.
+        for i in range(3):
+            self.assertEqual(self.post_raw(data, {"a": 1}, title="Raw")["id"], image_id)
+        self.assertEqual(list(DesignState.objects.filter(image_id=image_id)), [current])
+
+        # Other states are kept in a single row besides the current one.
+        self.post_raw(data, {"a": 2}, title="Raw")
+        self.post_raw(data, {"a": 3}, title="Raw")
+        history = DesignState.objects.filter(image_id=image_id).exclude(pk=current.pk).get()
+        self.assertEqual(history.designstate, {"a": 3})
+        self.assertEqual(DesignState.objects.latest_for(image_id), current)
+        self.assertEqual(DesignState.objects.get(pk=current.pk).designstate, {"a": 1})
+
+        self.post_raw(data, {"a": 3}, title="Raw")
+        self.assertEqual(DesignState.objects.filter(image_id=image_id).count(), 2)
+
+    @mock.patch.object(models, "DESIGN_STATE_DELTAS", True)
+    def test_history_with_deltas(self):
+        data = make_png(size=16)
+        image_id = self.post_raw(data, {"a": 1}, title="Raw")["id"]
+
+        for state in [{"a": 1}, {"a": 2}, {"a": 2}, {"a": 1}, {"a": 3}]:
+            self.post_raw(data, state, title="Raw")
+
+        # Only states differing from both the current and the latest one are added.
+        states = DesignState.objects.filter(image_id=image_id).order_by("pk")
+        self.assertEqual([state.get_design_state() for state in states], [{"a": 1}, {"a": 2}, {"a": 3}])
+        self.assertEqual(DesignState.objects.latest_for(image_id).get_design_state(), {"a": 1})
@@ -0,0 +1,61 @@
+import io
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image as PILImage
+from wagtail.images import get_image_model
+
+from filerobot.utils.collection import (
+    chooser_collection_ids,
+    filerobot_collection,
+    originals_collection,
+    user_collections,
+)
+
+
+Image = get_image_model()
+
+
+def make_png(color = "red", size = 8) -> bytes:
+    f = io.BytesIO()
+    PILImage.new("RGB", (size, size), color).save(f, "PNG")
+    return f.getvalue()
+
+
+def create_image(title = "test", color = "red", **kwargs):
+    return Image.objects.create(
+        title=title,
+        file=ContentFile(make_png(color), name=f"{title}.png"),
+        **kwargs,
+    )
+
+
+class FilerobotTestCase(TestCase):
+    """
+        Writes uploaded files to a temporary MEDIA_ROOT, removed after the tests.
+
+        Cached collections are dropped before every test;
+        they would outlive the rolled back rows they point to.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media_root = tempfile.mkdtemp(prefix="filerobot-tests-")
+        cls._media_settings = override_settings(MEDIA_ROOT=cls._media_root)
+        cls._media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media_settings.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for resolver in (filerobot_collection, originals_collection, user_collections, chooser_collection_ids):
+            resolver.invalidate()
@@ -10,11 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Test the checkout itself, installed or not.
+sys.path.insert(0, str(BASE_DIR.parent.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
@@ -33,7 +37,7 @@ ALLOWED_HOSTS = []
 INSTALLED_APPS = [
     'core',
 
-    'wagtail-filerobot',
+    'filerobot',
 
     'wagtail',
     'wagtail.sites',
@@ -131,6 +135,17 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+MEDIA_ROOT = BASE_DIR / 'media'
+
+MEDIA_URL = 'media/'
+
+
+# Wagtail
+
+WAGTAIL_SITE_NAME = 'testapp'
+
+WAGTAILADMIN_BASE_URL = 'http://localhost:8000'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 